@@ -5,9 +5,9 @@ Handles API endpoints and webhooks
 from flask import Flask, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
 from voice_handler import VoiceHandler
-from elevenlabs_handler import ElevenLabsHandler
+from elevenlabs_handler import ElevenLabsHandler, parse_json, extract_messages
 from ocr_handler import OCRHandler
-from database import Database
+from database import Database, close_thread_connections
 from config import FLASK_PORT, FLASK_DEBUG
 from demo_mode import DemoMode
 
@@ -50,6 +50,7 @@ CORS(app)
 db = Database()
 voice_handler = VoiceHandler()
 elevenlabs_handler = ElevenLabsHandler()
+elevenlabs_handler.start_warmup()
 ocr_handler = OCRHandler()
 paddleocr_handler = None
 if PADDLEOCR_AVAILABLE and PaddleOCRHandler:
@@ -83,6 +84,12 @@ demo_mode = DemoMode()
 DEMO_MODE = os.getenv('DEMO_MODE', 'false').lower() == 'true'
 
 
+@app.teardown_appcontext
+def close_db_connections(exception=None):
+    """Close the request thread's database connections - each thread opens its own (pyodbc pools the driver connections)"""
+    close_thread_connections()
+
+
 @app.route('/')
 def index():
     """Serve the main dashboard"""
@@ -317,31 +324,8 @@ def elevenlabs_voice_flow():
             response.hangup()
             return str(response), 200, {'Content-Type': 'text/xml'}
         
-        # Get WebSocket URL from cache
-        ws_url = elevenlabs_handler.questions_cache.get(f'{call_id}_ws_url')
-        if not ws_url:
-            # Try to get signed URL again, but fallback to direct URL if permission is missing
-            try:
-                import requests
-                ws_url_response = requests.get(
-                    'https://api.elevenlabs.io/v1/convai/conversation/get-signed-url',
-                    headers={'xi-api-key': elevenlabs_handler.api_key},
-                    params={'agent_id': agent_id or elevenlabs_handler.agent_id},
-                    timeout=10
-                )
-                if ws_url_response.status_code == 200:
-                    signed_url_data = ws_url_response.json()
-                    ws_url = signed_url_data.get('signed_url')
-                    if ws_url:
-                        elevenlabs_handler.questions_cache[f'{call_id}_ws_url'] = ws_url
-                elif ws_url_response.status_code == 401:
-                    # Missing permissions - use direct URL for public agents
-                    logger.warning("Cannot get signed URL due to missing permissions, using direct WebSocket URL")
-                    ws_url = f'wss://api.elevenlabs.io/v1/convai/conversation?agent_id={agent_id or elevenlabs_handler.agent_id}'
-                    elevenlabs_handler.questions_cache[f'{call_id}_ws_url'] = ws_url
-            except Exception as e:
-                logger.warning(f"Error getting WebSocket URL: {str(e)}, using direct URL")
-                ws_url = f'wss://api.elevenlabs.io/v1/convai/conversation?agent_id={agent_id or elevenlabs_handler.agent_id}'
+        # Get WebSocket URL (signed URLs are cached per agent by the handler)
+        ws_url = elevenlabs_handler.get_signed_ws_url(agent_id)
         
         if not ws_url:
             logger.error(f"No WebSocket URL available for call_id={call_id}")
@@ -351,7 +335,8 @@ def elevenlabs_voice_flow():
             return str(response), 200, {'Content-Type': 'text/xml'}
         
         # Get conversation context (questions) from cache
-        conversation_context = elevenlabs_handler.questions_cache.get(f'{call_id}_context', '')
+        call_entry = elevenlabs_handler.get_cached_call(call_id) or {}
+        conversation_context = call_entry.get('context', '')
         logger.info(f"Conversation context for call_id={call_id}: {conversation_context[:200]}...")
         
         # IMPORTANT: ElevenLabs native Twilio integration
@@ -371,7 +356,7 @@ def elevenlabs_voice_flow():
         response = VoiceResponse()
         
         # Try to get ElevenLabs phone number from cache
-        phone_number_id = elevenlabs_handler.questions_cache.get(f'{call_id}_phone_id')
+        phone_number_id = call_entry.get('phone_id')
         
         # For now, let's use a simpler approach:
         # 1. Say a greeting
@@ -493,19 +478,20 @@ def elevenlabs_stream():
 def elevenlabs_webhook():
     """Webhook endpoint for ElevenLabs events"""
     try:
-        # Get webhook data
-        if request.is_json:
-            webhook_data = request.json
-        else:
-            webhook_data = request.form.to_dict()
+        raw_body = request.get_data()
         
-        # Log raw webhook data for debugging
+        # Verify webhook signature on the raw body before parsing anything (only if a secret is configured)
+        if elevenlabs_handler.webhook_secret and not elevenlabs_handler.validate_webhook_signature(
+                raw_body, request.headers.get('ElevenLabs-Signature')):
+            logger.warning("Rejected ElevenLabs webhook: missing or invalid signature")
+            return jsonify({'status': 'forbidden', 'message': 'Invalid signature'}), 401
         
-        # Verify webhook signature if secret is configured
-        if elevenlabs_handler.webhook_secret:
-            # Add signature verification logic here based on ElevenLabs docs
-            # For now, we'll skip verification but log it
-            logger.info("Webhook secret configured but verification not implemented yet")
+        # Get webhook data - form posts keep their fields; any other body is JSON (whatever its Content-Type)
+        # and is handed over raw for handle_webhook to parse; an empty body is an empty event, as before
+        if request.mimetype in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+            webhook_data = request.form.to_dict()
+        else:
+            webhook_data = raw_body or b'{}'
         
         # Process webhook
         result = elevenlabs_handler.handle_webhook(webhook_data)
@@ -539,7 +525,7 @@ def test_log_extraction():
         # Parse JSON string
         try:
             if isinstance(webhook_data_str, str):
-                data = json.loads(webhook_data_str)
+                data = parse_json(webhook_data_str)
             else:
                 data = webhook_data_str
         except json.JSONDecodeError as e:
@@ -553,56 +539,9 @@ def test_log_extraction():
         logger.info(f"Webhook data keys: {list(data.keys())}")
         
         # Extract messages using the same logic as handle_webhook
-        messages_data = data.get('data', {})
-        messages = []
-        
-        if isinstance(messages_data, dict):
-            # Check if there's a nested 'data' key
-            inner_data = messages_data.get('data', {})
-            if isinstance(inner_data, dict):
-                # Try 'messages' first
-                if 'messages' in inner_data:
-                    messages = inner_data.get('messages', [])
-                    logger.info(f"✅ Found messages in data.data.messages: {len(messages)} messages")
-                # Try 'transcript' as alternative
-                elif 'transcript' in inner_data:
-                    transcript_data = inner_data.get('transcript', [])
-                    if isinstance(transcript_data, list):
-                        messages = transcript_data
-                    elif isinstance(transcript_data, str):
-                        messages = [{'role': 'user', 'message': transcript_data}]
-                    logger.info(f"✅ Found transcript in data.data.transcript: {len(messages)} items")
-            
-            # Try messages directly in data
-            if not messages:
-                if 'messages' in messages_data:
-                    messages = messages_data.get('messages', [])
-                    logger.info(f"✅ Found messages in data.messages: {len(messages)} messages")
-                elif 'transcript' in messages_data:
-                    transcript_data = messages_data.get('transcript', [])
-                    if isinstance(transcript_data, list):
-                        messages = transcript_data
-                    elif isinstance(transcript_data, str):
-                        messages = [{'role': 'user', 'message': transcript_data}]
-                    logger.info(f"✅ Found transcript in data.transcript: {len(messages)} items")
-        
-        # Fallback: try root level
-        if not messages:
-            if 'messages' in data:
-                messages = data.get('messages', [])
-                logger.info(f"✅ Found messages in root: {len(messages)} messages")
-            elif 'transcript' in data:
-                transcript_data = data.get('transcript', [])
-                if isinstance(transcript_data, list):
-                    messages = transcript_data
-                elif isinstance(transcript_data, str):
-                    messages = [{'role': 'user', 'message': transcript_data}]
-                logger.info(f"✅ Found transcript in root: {len(messages)} items")
-            elif 'transcription' in data:
-                transcription_data = data.get('transcription', '')
-                if isinstance(transcription_data, str) and transcription_data:
-                    messages = [{'role': 'user', 'message': transcription_data}]
-                    logger.info(f"✅ Found transcription in root: {len(transcription_data)} chars")
+        messages, path = extract_messages(data)
+        if messages:
+            logger.info(f"✅ Found messages in {'.'.join(path)}: {len(messages)} items")
         
         if not messages:
             logger.warning(f"⚠️ No messages found in webhook data for log_id={log_id}")
@@ -1679,17 +1618,15 @@ def submit_elevenlabs_form():
     try:
         # Get webhook data
         if request.is_json:
-            webhook_data = request.json
+            webhook_data = parse_json(request.get_data())
         else:
             webhook_data = request.form.to_dict()
         
         # Validate signature
-        timestamp = request.headers.get('ElevenLabs-Timestamp')
         signature = request.headers.get('ElevenLabs-Signature')
         
-        if timestamp and signature:
-            body = request.data.decode('utf-8')
-            if not elevenlabs_handler.validate_webhook_signature(timestamp, body, signature):
+        if signature:
+            if not elevenlabs_handler.validate_webhook_signature(request.get_data(), signature):
                 return jsonify({'error': 'Invalid signature'}), 401
         
         # Parse payload
@@ -1777,7 +1714,7 @@ def elevenlabs_agent_webhook():
     try:
         # Get webhook data
         if request.is_json:
-            webhook_data = request.json
+            webhook_data = parse_json(request.get_data())
         else:
             webhook_data = request.form.to_dict()
         
@@ -1858,8 +1795,7 @@ def elevenlabs_agent_webhook():
 def end_elevenlabs_agent_session(session_id):
     """End an agent session"""
     try:
-        if session_id in elevenlabs_handler.questions_cache:
-            del elevenlabs_handler.questions_cache[session_id]
+        elevenlabs_handler.forget_call(session_id)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -2117,5 +2053,6 @@ def verify_elevenlabs_agent():
 
 if __name__ == '__main__':
     logger.info(f"Starting Voice Call System on port {FLASK_PORT}")
-    app.run(debug=FLASK_DEBUG, port=FLASK_PORT, host='0.0.0.0')
+    # Handlers block on ElevenLabs/Twilio/DB I/O - serve each request on its own thread
+    app.run(debug=FLASK_DEBUG, port=FLASK_PORT, host='0.0.0.0', threaded=True)
 
@@ -35,6 +35,9 @@ ELEVENLABS_AGENT_ID = os.getenv('ELEVENLABS_AGENT_ID', '')
 ELEVENLABS_WEBHOOK_SECRET = os.getenv('ELEVENLABS_WEBHOOK_SECRET', '')
 # Custom endpoint override (leave empty to use default attempts)
 ELEVENLABS_CALL_ENDPOINT = os.getenv('ELEVENLABS_CALL_ENDPOINT', '')
+# Local limits on outbound call requests (queue here instead of hitting provider 429s)
+ELEVENLABS_MAX_CONCURRENT_CALLS = int(os.getenv('ELEVENLABS_MAX_CONCURRENT_CALLS', '10'))
+ELEVENLABS_CALLS_PER_SECOND = float(os.getenv('ELEVENLABS_CALLS_PER_SECOND', '5'))
 
 # Dialogflow Configuration
 DIALOGFLOW_PROJECT_ID = os.getenv('DIALOGFLOW_PROJECT_ID', '')
@@ -7,18 +7,43 @@ import json
 from datetime import datetime
 from config import DB_CONNECTION_STRING
 import logging
+import threading
+import weakref
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Every Database instance, so a request thread can close all of its connections at once
+_instances = weakref.WeakSet()
+
+
+def close_thread_connections():
+    """Close the calling thread's connection on every Database (Flask calls this when a request ends)"""
+    for database in list(_instances):
+        try:
+            database.close()
+        except Exception as e:
+            logger.warning(f"Error closing database connection: {str(e)}")
+
 
 class Database:
     def __init__(self):
         self.connection_string = DB_CONNECTION_STRING
-        self.conn = None
+        # pyodbc connections are not thread-safe, so each thread gets its own
+        self._local = threading.local()
+        _instances.add(self)
+    
+    @property
+    def conn(self):
+        """This thread's connection (None until get_connection opens one)"""
+        return getattr(self._local, 'conn', None)
+    
+    @conn.setter
+    def conn(self, value):
+        self._local.conn = value
     
     def get_connection(self):
-        """Get database connection"""
+        """Get database connection for the calling thread"""
         try:
             # Check if connection exists and is still valid
             if self.conn is not None:
@@ -79,6 +104,34 @@ class Database:
             logger.error(f"Query execution error: {str(e)}")
             raise
     
+    def _executemany(self, query, rows):
+        """Execute a query once per parameter row in a single batch, committed together (rolled back on error)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.fast_executemany = True
+            cursor.executemany(query, rows)
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception as rollback_error:
+                logger.warning(f"Rollback failed: {str(rollback_error)}")
+            raise
+        finally:
+            cursor.close()
+    
+    def _save_each(self, what, save_row, rows):
+        """Fallback for a failed batch: save rows one by one, raising afterwards if any of them failed"""
+        failed = 0
+        for row in rows:
+            try:
+                save_row(*row)
+            except Exception:
+                failed += 1  # execute has already logged the error
+        if failed:
+            raise Exception(f"{failed} of {len(rows)} {what} could not be saved")
+    
     def fetch_one(self, query, params=None):
         """Fetch one row"""
         try:
@@ -223,6 +276,30 @@ class Database:
             logger.error(f"Error getting call_id by call_sid: {str(e)}")
             return None
     
+    def get_call_id_by_sid_or_conv(self, call_sid, conversation_id):
+        """
+        Get call_id (database ID) whose call_sid is either the Twilio call_sid or the ElevenLabs
+        conversation_id, in one round-trip (a call_sid match wins)
+        """
+        query = """
+        SELECT TOP 1 id
+        FROM calls
+        WHERE call_sid IN (?, ?)
+        ORDER BY CASE WHEN call_sid = ? THEN 0 ELSE 1 END
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, (call_sid, conversation_id, call_sid))
+            row = cursor.fetchone()
+            cursor.close()
+            if row:
+                return row[0]
+            return None
+        except Exception as e:
+            logger.error(f"Error getting call_id by call_sid/conversation_id: {str(e)}")
+            return None
+    
     # Question Management Methods
     def save_question(self, call_id, question_text, question_number):
         """Save question to database"""
@@ -232,6 +309,22 @@ class Database:
         """
         self.execute(query, (call_id, question_text, question_number))
     
+    def save_questions_bulk(self, call_id, questions):
+        """Save all questions for a call in one batch (question_number = list index)"""
+        query = """
+        INSERT INTO questions (call_id, question_text, question_number, created_at)
+        VALUES (?, ?, ?, GETDATE())
+        """
+        # question_text is NVARCHAR(500) - an overlong value would fail the whole batch
+        rows = [(call_id, (question.get('text') or '')[:500], idx) for idx, question in enumerate(questions)]
+        if not rows:
+            return
+        try:
+            self._executemany(query, rows)
+        except Exception as e:
+            logger.error(f"Error saving questions for call {call_id} in one batch, saving one at a time: {str(e)}")
+            self._save_each(f"questions for call {call_id}", self.save_question, rows)
+    
     def save_answer(self, call_id, question_num, answer, confidence, raw_response):
         """Save answer to a question"""
         query = """
@@ -242,6 +335,27 @@ class Database:
         """
         self.execute(query, (answer, confidence, raw_response, call_id, question_num))
     
+    def save_answers_bulk(self, call_id, answers):
+        """Save several answers for a call in one batch; answers are (question_num, answer, confidence, raw_response)"""
+        query = """
+        UPDATE questions
+        SET response = ?, response_confidence = ?, raw_response = ?,
+            response_time_seconds = DATEDIFF(SECOND, created_at, GETDATE())
+        WHERE call_id = ? AND question_number = ?
+        """
+        # raw_response is NVARCHAR(200) - an overlong transcript would fail the whole batch
+        rows = [(answer, confidence, (raw_response or '')[:200], call_id, question_num)
+                for question_num, answer, confidence, raw_response in answers]
+        if not rows:
+            return
+        try:
+            self._executemany(query, rows)
+        except Exception as e:
+            logger.error(f"Error saving answers for call {call_id} in one batch, saving one at a time: {str(e)}")
+            self._save_each(f"answers for call {call_id}", self.save_answer,
+                            [(call_id, question_num, answer, confidence, raw_response)
+                             for answer, confidence, raw_response, call_id, question_num in rows])
+    
     def get_call_questions(self, call_id):
         """Get all questions for a call"""
         query = """
@@ -365,6 +479,30 @@ class Database:
             # Don't raise - we don't want webhook logging to break the webhook handler
             return None
     
+    def upsert_webhook_log(self, log_id, call_id, processed_successfully, error_message=None,
+                           event_type=None, conversation_id=None, call_sid=None, webhook_data=None):
+        """
+        Record a webhook's outcome: update row log_id in one statement, or save a complete row
+        (event_type, conversation_id, call_sid, webhook_data) when there is no row yet
+        """
+        if not log_id:
+            return self.save_webhook_log(
+                event_type=event_type,
+                conversation_id=conversation_id,
+                call_id=call_id,
+                call_sid=call_sid,
+                webhook_data=webhook_data,
+                processed_successfully=processed_successfully,
+                error_message=error_message
+            )
+        query = """
+        UPDATE webhook_logs 
+        SET processed_successfully = ?, error_message = ?, call_id = ?
+        WHERE id = ?
+        """
+        self.execute(query, (1 if processed_successfully else 0, error_message, call_id, log_id))
+        return log_id
+    
     def get_webhook_logs(self, conversation_id=None, call_id=None, event_type=None, limit=100):
         """Get webhook logs with optional filters"""
         query = """
@@ -517,7 +655,7 @@ class Database:
         return self.fetch_all(query)
     
     def close(self):
-        """Close database connection"""
+        """Close the calling thread's database connection"""
         if self.conn:
             self.conn.close()
             self.conn = None
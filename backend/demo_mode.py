@@ -11,13 +11,21 @@ from database import Database
 
 class DemoMode:
     def __init__(self):
-        try:
-            self.db = Database()
-            self.db_available = True
-        except Exception as e:
-            # Database not available, but demo mode can still work
-            self.db = None
-            self.db_available = False
+        # Database is created on first use so simulations that never touch it pay nothing
+        self._db = None
+        self._db_tried = False
+    
+    @property
+    def db(self):
+        """Lazily create the database handle; None if unavailable"""
+        if not self._db_tried:
+            self._db_tried = True
+            try:
+                self._db = Database()
+            except Exception as e:
+                # Database not available, but demo mode can still work
+                self._db = None
+        return self._db
     
     def simulate_call(self, phone_number, questions):
         """Simulate a complete call flow"""
@@ -26,22 +34,30 @@ class DemoMode:
             call_sid = f"CA_DEMO_{call_id}_{random.randint(100000, 999999)}"
             
             # Try to use database if available
-            if self.db_available and self.db:
+            db = self.db
+            if db is not None:
                 try:
-                    call_id = self.db.create_call(phone_number, questions)
-                    self.db.update_call_sid(call_id, call_sid)
-                    self.db.update_call_status(call_sid, "ringing")
+                    call_id = db.create_call(phone_number, questions)
+                    db.update_call_sid(call_id, call_sid)
+                    db.update_call_status(call_sid, "ringing")
                     time.sleep(0.5)
-                    self.db.update_call_status(call_sid, "in-progress")
-                    self.db.update_call_status(call_sid, "completed")
+                    db.update_call_status(call_sid, "in-progress")
+                    db.update_call_status(call_sid, "completed")
                 except Exception as db_error:
                     # Database failed, continue without it
-                    self.db_available = False
+                    self._db = db = None
             
             # Simulate answers
             answers = ["yes", "no", "yes", "no", "yes"]  # Sample answers
             question_responses = []
             
+            # Insert all questions in one batch; the loop below fills in their answers
+            if db is not None:
+                try:
+                    db.save_questions_bulk(call_id, questions)
+                except:
+                    pass  # Continue even if DB save fails
+            
             for idx, question in enumerate(questions):
                 answer = answers[idx % len(answers)]
                 confidence = round(random.uniform(0.85, 0.98), 2)
@@ -56,10 +72,9 @@ class DemoMode:
                 })
                 
                 # Try to save to database if available
-                if self.db_available and self.db:
+                if db is not None:
                     try:
-                        self.db.save_question(call_id, question.get('text', ''), idx)
-                        self.db.save_answer(
+                        db.save_answer(
                             call_id=call_id,
                             question_num=idx,
                             answer=answer,
@@ -92,9 +107,9 @@ class DemoMode:
             }
             
             # Try to save results to database if available
-            if self.db_available and self.db:
+            if db is not None:
                 try:
-                    self.db.save_call_results(call_id, results)
+                    db.save_call_results(call_id, results)
                 except:
                     pass  # Continue even if DB save fails
             
@@ -17,6 +17,41 @@ except ImportError:
     logger.warning("google-cloud-dialogflow not installed. Install with: pip install google-cloud-dialogflow")
 
 
+# Fallback intent detection tables (keyword -> intent)
+_KEYWORD_INTENT = {
+    # Yes
+    'yes': 'yes', 'yeah': 'yes', 'yep': 'yes', 'sure': 'yes', 'correct': 'yes',
+    'affirmative': 'yes', 'ok': 'yes', 'okay': 'yes', 'yup': 'yes', 'right': 'yes',
+    # No
+    'no': 'no', 'nope': 'no', 'nah': 'no', 'incorrect': 'no', 'negative': 'no',
+    'wrong': 'no', 'not': 'no',
+    # Repeat
+    'repeat': 'repeat', 'again': 'repeat',
+    # Skip
+    'skip': 'skip', 'next': 'skip', 'pass': 'skip', 'continue': 'skip',
+}
+
+_PHRASE_INTENT = (
+    ('what was the question', 'repeat'),
+    ('move on', 'skip'),
+)
+
+_INTENT_RESPONSES = {
+    'yes': {'intent': 'yes', 'confidence': 0.8, 'fulfillment_text': 'Yes'},
+    'no': {'intent': 'no', 'confidence': 0.8, 'fulfillment_text': 'No'},
+    'repeat': {'intent': 'repeat', 'confidence': 0.8, 'fulfillment_text': 'Repeat'},
+    'skip': {'intent': 'skip', 'confidence': 0.8, 'fulfillment_text': 'Skip'},
+    'unclear': {
+        'intent': 'unclear',
+        'confidence': 0.3,
+        'fulfillment_text': 'I did not understand that. Please say yes or no.'
+    },
+}
+
+# Maps punctuation to spaces so "yes." / "no," tokenize cleanly
+_PUNCTUATION_TABLE = str.maketrans({c: ' ' for c in '.,!?;:"()'})
+
+
 class DialogflowHandler:
     def __init__(self):
         self.project_id = DIALOGFLOW_PROJECT_ID
@@ -197,51 +232,16 @@ class DialogflowHandler:
         """Fallback intent detection using simple text matching"""
         text_lower = text.lower().strip()
         
-        # Yes detection
-        yes_words = ['yes', 'yeah', 'yep', 'sure', 'correct', 'affirmative', 'ok', 'okay', 'yup', 'right']
-        if any(word in text_lower for word in yes_words):
-            return {
-                'intent': 'yes',
-                'confidence': 0.8,
-                'fulfillment_text': 'Yes',
-                'query_text': text
-            }
-        
-        # No detection
-        no_words = ['no', 'nope', 'nah', 'incorrect', 'negative', 'wrong', 'not']
-        if any(word in text_lower for word in no_words):
-            return {
-                'intent': 'no',
-                'confidence': 0.8,
-                'fulfillment_text': 'No',
-                'query_text': text
-            }
-        
-        # Repeat detection
-        repeat_words = ['repeat', 'again', 'say that again', 'what was the question', 'can you repeat']
-        if any(word in text_lower for word in repeat_words):
-            return {
-                'intent': 'repeat',
-                'confidence': 0.8,
-                'fulfillment_text': 'Repeat',
-                'query_text': text
-            }
+        # Single pass over the tokens: one dict lookup per word
+        for token in text_lower.translate(_PUNCTUATION_TABLE).split():
+            intent = _KEYWORD_INTENT.get(token)
+            if intent:
+                return dict(_INTENT_RESPONSES[intent], query_text=text)
         
-        # Skip detection
-        skip_words = ['skip', 'next', 'pass', 'move on', 'continue']
-        if any(word in text_lower for word in skip_words):
-            return {
-                'intent': 'skip',
-                'confidence': 0.8,
-                'fulfillment_text': 'Skip',
-                'query_text': text
-            }
+        # Multi-word phrases without a single-word trigger
+        for phrase, intent in _PHRASE_INTENT:
+            if phrase in text_lower:
+                return dict(_INTENT_RESPONSES[intent], query_text=text)
         
         # Default to unclear
-        return {
-            'intent': 'unclear',
-            'confidence': 0.3,
-            'fulfillment_text': 'I did not understand that. Please say yes or no.',
-            'query_text': text
-        }
-
+        return dict(_INTENT_RESPONSES['unclear'], query_text=text)
@@ -3,21 +3,43 @@ Document Processing Handler - Extract text and tables from PDF
 Uses PyMuPDF for text (sort=True) and tables (find_tables())
 Falls back to pdfplumber for complex tables
 """
+import io
 import os
+import json
+import shutil
+import time
+import hashlib
 import logging
+import tempfile
 from werkzeug.utils import secure_filename
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Allowed file extensions
-ALLOWED_EXTENSIONS = {'pdf'}
+ALLOWED_EXTENSIONS = frozenset(('.pdf',))
 
 # Upload folder configuration
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Extraction results cache, keyed by SHA-256 of the uploaded file
+EXTRACTION_CACHE_FOLDER = os.path.join(UPLOAD_FOLDER, '.cache')
+# Bump when the extraction output format changes to invalidate old entries
+EXTRACTION_CACHE_VERSION = 2
+# Entries unused for this long are removed, and the oldest go first beyond the entry cap
+EXTRACTION_CACHE_MAX_AGE = 30 * 24 * 3600
+MAX_EXTRACTION_CACHE_ENTRIES = 500
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Upload streaming: large buffered writes instead of many small ones
+UPLOAD_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+UPLOAD_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Fall back to pdfplumber for tables only if PyMuPDF fails on more than this share of pages
+MAX_TABLE_ERROR_RATIO = 0.5
+
 
 class DocumentProcessingHandler:
     def __init__(self):
@@ -25,160 +47,78 @@ class DocumentProcessingHandler:
     
     def allowed_file(self, filename):
         """Check if file extension is allowed"""
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+        return os.path.splitext(filename)[1].lower() in ALLOWED_EXTENSIONS
     
     def save_uploaded_file(self, file, filename):
-        """Save uploaded file to uploads folder"""
+        """Save uploaded file to uploads folder, returns (file_path, bytes_written)"""
         secure_name = secure_filename(filename)
         file_path = os.path.join(self.upload_folder, secure_name)
-        file.save(file_path)
+        # Stream straight to disk in 1 MB chunks through a 4 MB buffer
+        with open(file_path, 'wb', buffering=UPLOAD_WRITE_BUFFER_SIZE) as out:
+            shutil.copyfileobj(file.stream, out, length=UPLOAD_COPY_CHUNK_SIZE)
+            bytes_written = out.tell()
         logger.info(f"File saved to: {file_path}")
-        return file_path
+        return file_path, bytes_written
     
-    def extract_text_pymupdf(self, pdf_path):
-        """
-        Extract text from PDF using PyMuPDF in reading order
-        Uses page.get_text(sort=True) for proper reading order
+    def _build_table_dict(self, table_data, page_num, table_index, method):
         """
-        try:
-            import fitz  # PyMuPDF
-            logger.info(f"Extracting text from PDF using PyMuPDF (sort=True): {pdf_path}")
-            
-            doc = fitz.open(pdf_path)
-            num_pages = len(doc)
-            logger.info(f"PDF has {num_pages} pages")
-            
-            all_text = []
-            
-            for page_num in range(num_pages):
-                page = doc[page_num]
-                # Extract text in reading order (sort=True)
-                text = page.get_text(sort=True)
-                if text.strip():
-                    all_text.append(text)
-                    logger.info(f"Extracted text from page {page_num + 1}/{num_pages}")
-            
-            doc.close()
-            
-            # Join all pages with double newline
-            full_text = '\n\n'.join(all_text)
-            logger.info(f"✅ Successfully extracted text from {num_pages} pages")
-            return full_text
-            
-        except ImportError:
-            logger.error("PyMuPDF (fitz) is not installed. Please install it: pip install PyMuPDF")
-            raise ImportError("PyMuPDF (fitz) is required for text extraction")
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF with PyMuPDF: {str(e)}")
-            raise
-    
-    def extract_tables_pymupdf(self, pdf_path):
-        """
-        Extract tables from PDF using PyMuPDF's native table extraction (1.23+)
-        Returns list of tables as dictionaries
+        Convert raw extracted table cells (first row = headers) into the table dictionary format
+        Returns None if the table is empty after cleaning
         """
-        try:
-            import fitz  # PyMuPDF
-            import pandas as pd
-            
-            logger.info(f"Extracting tables from PDF using PyMuPDF find_tables(): {pdf_path}")
-            
-            doc = fitz.open(pdf_path)
-            num_pages = len(doc)
-            logger.info(f"PDF has {num_pages} pages")
-            
-            all_tables = []
-            table_index = 0
-            
-            for page_num in range(num_pages):
-                page = doc[page_num]
-                
-                # Use PyMuPDF's native table finder (available in 1.23+)
-                try:
-                    # Try with default settings
-                    tables = page.find_tables()
-                    logger.info(f"Page {page_num + 1}: Found {len(tables)} tables using PyMuPDF")
-                    
-                    for table_idx, table in enumerate(tables):
-                        try:
-                            # Extract table data
-                            table_data = table.extract()
-                            
-                            if table_data and len(table_data) > 0:
-                                # Filter out empty rows
-                                table_data = [row for row in table_data if any(cell and str(cell).strip() for cell in row)]
-                                
-                                if len(table_data) > 0:
-                                    # First row as headers
-                                    headers = table_data[0] if len(table_data) > 0 else []
-                                    rows = table_data[1:] if len(table_data) > 1 else []
-                                    
-                                    # Clean headers - convert None to empty string
-                                    headers = [str(h).strip() if h is not None else '' for h in headers]
-                                    
-                                    # Convert to DataFrame for easier handling
-                                    df = pd.DataFrame(rows, columns=headers)
-                                    
-                                    # Remove completely empty rows and columns
-                                    df = df.dropna(how='all').dropna(axis=1, how='all')
-                                    
-                                    if len(df) > 0 and len(df.columns) > 0:
-                                        # Convert to dictionary format
-                                        table_dict = {
-                                            'table_index': table_index + 1,
-                                            'page': page_num + 1,
-                                            'method': 'pymupdf',
-                                            'headers': df.columns.tolist(),
-                                            'rows': df.values.tolist(),
-                                            'row_count': len(df),
-                                            'column_count': len(df.columns),
-                                            'dataframe': df.to_dict('records')  # Also include as records
-                                        }
-                                        
-                                        all_tables.append(table_dict)
-                                        table_index += 1
-                                        logger.info(f"  Table {table_index}: {len(df)} rows x {len(df.columns)} columns")
-                                
-                        except Exception as table_error:
-                            logger.warning(f"Error extracting table {table_idx + 1} from page {page_num + 1}: {str(table_error)}")
-                            continue
-                            
-                except AttributeError:
-                    # find_tables() not available in this PyMuPDF version
-                    logger.warning(f"PyMuPDF find_tables() not available. Version might be < 1.23. Falling back to pdfplumber.")
-                    doc.close()
-                    return self.extract_tables_pdfplumber(pdf_path)
-                except Exception as e:
-                    logger.warning(f"Error using PyMuPDF find_tables() on page {page_num + 1}: {str(e)}")
-                    continue
-            
-            doc.close()
-            
-            # If no tables found with PyMuPDF, try pdfplumber as fallback
-            if len(all_tables) == 0:
-                logger.info("No tables found with PyMuPDF, trying pdfplumber as fallback...")
-                return self.extract_tables_pdfplumber(pdf_path)
-            
-            logger.info(f"✅ Successfully extracted {len(all_tables)} tables using PyMuPDF")
-            return all_tables
-            
-        except ImportError:
-            logger.error("PyMuPDF (fitz) is not installed. Please install it: pip install PyMuPDF")
-            raise ImportError("PyMuPDF (fitz) is required for table extraction")
-        except Exception as e:
-            logger.error(f"Error extracting tables from PDF with PyMuPDF: {str(e)}")
-            # Fallback to pdfplumber
-            logger.info("Falling back to pdfplumber for table extraction...")
-            return self.extract_tables_pdfplumber(pdf_path)
+        if not table_data or len(table_data) == 0:
+            return None
+        
+        # Filter out empty rows
+        table_data = [row for row in table_data if any(cell and str(cell).strip() for cell in row)]
+        if len(table_data) == 0:
+            return None
+        
+        # First row as headers
+        headers = table_data[0] if len(table_data) > 0 else []
+        rows = table_data[1:] if len(table_data) > 1 else []
+        
+        # Clean headers - convert None to empty string
+        headers = [str(h).strip() if h is not None else '' for h in headers]
+        width = len(headers)
+        
+        # Pad short rows to the header width
+        padded_rows = []
+        for row in rows:
+            if len(row) > width:
+                raise ValueError(f"{width} columns passed, passed data had {len(row)} columns")
+            padded_rows.append(list(row) + [None] * (width - len(row)))
+        
+        # Remove completely empty rows and columns
+        rows = [row for row in padded_rows if any(cell is not None for cell in row)]
+        keep = [col for col in range(width) if any(row[col] is not None for row in rows)]
+        
+        if len(rows) == 0 or len(keep) == 0:
+            return None
+        
+        if len(keep) < width:
+            headers = [headers[col] for col in keep]
+            rows = [[row[col] for col in keep] for row in rows]
+        
+        # Convert to dictionary format
+        return {
+            'table_index': table_index + 1,
+            'page': page_num + 1,
+            'method': method,
+            'headers': headers,
+            'rows': rows,
+            'row_count': len(rows),
+            'column_count': len(headers),
+            'dataframe': [dict(zip(headers, row)) for row in rows]  # Also include as records
+        }
     
-    def extract_tables_pdfplumber(self, pdf_path):
+    def extract_tables_pdfplumber(self, pdf_path, pdf_bytes=None):
         """
         Extract tables from PDF using pdfplumber (fallback for complex tables)
+        If pdf_bytes is given the document is parsed from memory instead of re-reading pdf_path
         Returns list of tables as dictionaries
         """
         try:
             import pdfplumber
-            import pandas as pd
             
             logger.info(f"Extracting tables from PDF using pdfplumber (fallback): {pdf_path}")
             
@@ -197,24 +137,30 @@ class DocumentProcessingHandler:
                 "min_words_horizontal": 1,
             }
             
-            with pdfplumber.open(pdf_path) as pdf:
+            with pdfplumber.open(io.BytesIO(pdf_bytes) if pdf_bytes is not None else pdf_path) as pdf:
                 num_pages = len(pdf.pages)
                 logger.info(f"PDF has {num_pages} pages")
                 
+                debug_enabled = logger.isEnabledFor(logging.DEBUG)
+                
                 for page_num, page in enumerate(pdf.pages):
                     # Try with custom settings first
                     tables = page.extract_tables(table_settings=table_settings)
-                    logger.info(f"Page {page_num + 1}: Found {len(tables)} tables using pdfplumber (custom settings)")
+                    if debug_enabled:
+                        logger.debug(f"Page {page_num + 1}: Found {len(tables)} tables using pdfplumber (custom settings)")
                     
                     # If no tables found, try with default settings
                     if len(tables) == 0:
-                        logger.info(f"Page {page_num + 1}: No tables found with custom settings, trying default settings...")
+                        if debug_enabled:
+                            logger.debug(f"Page {page_num + 1}: No tables found with custom settings, trying default settings...")
                         tables = page.extract_tables()
-                        logger.info(f"Page {page_num + 1}: Found {len(tables)} tables using pdfplumber (default settings)")
+                        if debug_enabled:
+                            logger.debug(f"Page {page_num + 1}: Found {len(tables)} tables using pdfplumber (default settings)")
                     
                     # If still no tables, try with more lenient settings
                     if len(tables) == 0:
-                        logger.info(f"Page {page_num + 1}: No tables found with default settings, trying lenient settings...")
+                        if debug_enabled:
+                            logger.debug(f"Page {page_num + 1}: No tables found with default settings, trying lenient settings...")
                         lenient_settings = {
                             "vertical_strategy": "lines",  # More lenient
                             "horizontal_strategy": "lines",
@@ -222,48 +168,23 @@ class DocumentProcessingHandler:
                             "join_tolerance": 5,
                         }
                         tables = page.extract_tables(table_settings=lenient_settings)
-                        logger.info(f"Page {page_num + 1}: Found {len(tables)} tables using pdfplumber (lenient settings)")
+                        if debug_enabled:
+                            logger.debug(f"Page {page_num + 1}: Found {len(tables)} tables using pdfplumber (lenient settings)")
                     
                     for table_idx, table in enumerate(tables):
-                        if table and len(table) > 0:
-                            try:
-                                # Filter out completely empty rows
-                                table = [row for row in table if any(cell and str(cell).strip() for cell in row if cell is not None)]
-                                
-                                if len(table) > 0:
-                                    # First row as headers
-                                    headers = table[0] if len(table) > 0 else []
-                                    rows = table[1:] if len(table) > 1 else []
-                                    
-                                    # Clean headers - convert None to empty string
-                                    headers = [str(h).strip() if h is not None else '' for h in headers]
-                                    
-                                    # Convert to DataFrame
-                                    df = pd.DataFrame(rows, columns=headers)
-                                    
-                                    # Remove completely empty rows and columns
-                                    df = df.dropna(how='all').dropna(axis=1, how='all')
-                                    
-                                    if len(df) > 0 and len(df.columns) > 0:
-                                        # Convert to dictionary format
-                                        table_dict = {
-                                            'table_index': table_index + 1,
-                                            'page': page_num + 1,
-                                            'method': 'pdfplumber',
-                                            'headers': df.columns.tolist(),
-                                            'rows': df.values.tolist(),
-                                            'row_count': len(df),
-                                            'column_count': len(df.columns),
-                                            'dataframe': df.to_dict('records')  # Also include as records
-                                        }
-                                        
-                                        all_tables.append(table_dict)
-                                        table_index += 1
-                                        logger.info(f"  Table {table_index}: {len(df)} rows x {len(df.columns)} columns")
-                                
-                            except Exception as table_error:
-                                logger.warning(f"Error processing table {table_idx + 1} from page {page_num + 1}: {str(table_error)}")
-                                continue
+                        try:
+                            table_dict = self._build_table_dict(table, page_num, table_index, 'pdfplumber')
+                            if table_dict:
+                                all_tables.append(table_dict)
+                                table_index += 1
+                                if debug_enabled:
+                                    logger.debug(f"  Table {table_index}: {table_dict['row_count']} rows x {table_dict['column_count']} columns")
+                        except Exception as table_error:
+                            logger.warning(f"Error processing table {table_idx + 1} from page {page_num + 1}: {str(table_error)}")
+                            continue
+                    
+                    # Release the page's parsed objects so memory stays bounded to one page
+                    page.close()
             
             logger.info(f"✅ Successfully extracted {len(all_tables)} tables using pdfplumber")
             return all_tables
@@ -275,6 +196,87 @@ class DocumentProcessingHandler:
             logger.error(f"Error extracting tables with pdfplumber: {str(e)}")
             raise
     
+    def _extract_text_and_tables(self, pdf_path, pdf_bytes=None):
+        """
+        Extract text and tables from PDF in a single pass over the pages
+        Each page is parsed once for both get_text(sort=True) and find_tables()
+        If pdf_bytes is given the document is opened from memory instead of re-reading pdf_path
+        Returns (document_text, tables)
+        """
+        try:
+            import fitz  # PyMuPDF
+        except ImportError:
+            logger.error("PyMuPDF (fitz) is not installed. Please install it: pip install PyMuPDF")
+            raise ImportError("PyMuPDF (fitz) is required for text extraction")
+        
+        logger.info(f"Extracting text and tables from PDF using PyMuPDF (single pass): {pdf_path}")
+        
+        doc = fitz.open(stream=pdf_bytes, filetype='pdf') if pdf_bytes is not None else fitz.open(pdf_path)
+        num_pages = len(doc)
+        logger.info(f"PDF has {num_pages} pages")
+        
+        all_text = []
+        all_tables = []
+        table_index = 0
+        find_tables_available = True
+        pages_with_errors = 0
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        
+        try:
+            for page_num in range(num_pages):
+                page = doc[page_num]
+                
+                # Extract text in reading order (sort=True)
+                text = page.get_text(sort=True)
+                if text.strip():
+                    all_text.append(text)
+                
+                if not find_tables_available:
+                    continue
+                
+                # Use PyMuPDF's native table finder (available in 1.23+)
+                try:
+                    tables = list(page.find_tables())
+                except AttributeError:
+                    # find_tables() not available in this PyMuPDF version
+                    logger.warning("PyMuPDF find_tables() not available. Version might be < 1.23. Falling back to pdfplumber.")
+                    find_tables_available = False
+                    continue
+                except Exception as e:
+                    logger.warning(f"Error using PyMuPDF find_tables() on page {page_num + 1}: {str(e)}")
+                    pages_with_errors += 1
+                    continue
+                
+                if debug_enabled:
+                    logger.debug(f"Page {page_num + 1}: Found {len(tables)} tables using PyMuPDF")
+                
+                for table_idx, table in enumerate(tables):
+                    try:
+                        table_dict = self._build_table_dict(table.extract(), page_num, table_index, 'pymupdf')
+                        if table_dict:
+                            all_tables.append(table_dict)
+                            table_index += 1
+                            if debug_enabled:
+                                logger.debug(f"  Table {table_index}: {table_dict['row_count']} rows x {table_dict['column_count']} columns")
+                    except Exception as table_error:
+                        logger.warning(f"Error extracting table {table_idx + 1} from page {page_num + 1}: {str(table_error)}")
+                        continue
+        finally:
+            doc.close()
+        
+        # Join all pages with double newline
+        full_text = '\n\n'.join(all_text)
+        logger.info(f"✅ Successfully extracted text from {num_pages} pages")
+        
+        # Only re-parse with pdfplumber when PyMuPDF can't find tables or failed on most of the document
+        if not find_tables_available or pages_with_errors > num_pages * MAX_TABLE_ERROR_RATIO:
+            logger.info("PyMuPDF table extraction unavailable, trying pdfplumber as fallback...")
+            all_tables = self.extract_tables_pdfplumber(pdf_path, pdf_bytes)
+        else:
+            logger.info(f"✅ Successfully extracted {len(all_tables)} tables using PyMuPDF")
+        
+        return full_text, all_tables
+    
     def process_document(self, pdf_path):
         """
         Process PDF document: extract text and tables
@@ -282,11 +284,13 @@ class DocumentProcessingHandler:
         Returns dictionary with text and tables
         """
         try:
-            # Extract text using PyMuPDF (sort=True for reading order)
-            document_text = self.extract_text_pymupdf(pdf_path)
+            # Read the file once; PyMuPDF parses it from memory
+            with open(pdf_path, 'rb', buffering=0) as f:
+                pdf_bytes = f.read()
             
-            # Extract tables using PyMuPDF (with pdfplumber fallback)
-            tables = self.extract_tables_pymupdf(pdf_path)
+            # Extract text (sort=True for reading order) and tables (with pdfplumber fallback)
+            # in one pass over the PDF
+            document_text, tables = self._extract_text_and_tables(pdf_path, pdf_bytes)
             
             return {
                 'document_text': document_text,
@@ -297,6 +301,86 @@ class DocumentProcessingHandler:
             logger.error(f"Error processing document: {str(e)}")
             raise
     
+    def _file_sha256(self, file_path):
+        """Hash file contents incrementally so large uploads are never fully in memory"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _load_cached_result(self, content_hash):
+        """Return the cached process_document() result for this content hash, or None"""
+        cache_path = os.path.join(EXTRACTION_CACHE_FOLDER, f"{content_hash}.json")
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read extraction cache {cache_path}: {str(e)}")
+            return None
+        
+        if cached.get('version') != EXTRACTION_CACHE_VERSION:
+            return None
+        # Mark the entry as recently used so pruning keeps it
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return cached.get('result')
+    
+    def _save_cached_result(self, content_hash, result):
+        """Store a process_document() result under its content hash (best effort)"""
+        cache_path = os.path.join(EXTRACTION_CACHE_FOLDER, f"{content_hash}.json")
+        tmp_path = None
+        try:
+            os.makedirs(EXTRACTION_CACHE_FOLDER, exist_ok=True)
+            # Unique temp name so concurrent uploads of the same file don't write over each other
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=EXTRACTION_CACHE_FOLDER)
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': EXTRACTION_CACHE_VERSION, 'result': result}, f)
+            os.replace(tmp_path, cache_path)
+            tmp_path = None
+        except Exception as e:
+            logger.warning(f"Could not write extraction cache {cache_path}: {str(e)}")
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        self._prune_cache()
+    
+    def _prune_cache(self):
+        """Remove cache entries older than EXTRACTION_CACHE_MAX_AGE, then the oldest beyond MAX_EXTRACTION_CACHE_ENTRIES"""
+        cutoff = time.time() - EXTRACTION_CACHE_MAX_AGE
+        entries = []
+        try:
+            with os.scandir(EXTRACTION_CACHE_FOLDER) as it:
+                for entry in it:
+                    if not entry.is_file():
+                        continue
+                    mtime = entry.stat().st_mtime
+                    if entry.name.endswith('.json'):
+                        entries.append((mtime, entry.path))
+                    elif entry.name.endswith('.tmp') and mtime < cutoff:
+                        # Left behind by a process that died mid-write
+                        entries.append((mtime, entry.path))
+        except OSError as e:
+            logger.warning(f"Could not list extraction cache: {str(e)}")
+            return
+        
+        entries.sort()
+        excess = len(entries) - MAX_EXTRACTION_CACHE_ENTRIES
+        for index, (mtime, path) in enumerate(entries):
+            if mtime >= cutoff and index >= excess:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
     def process_uploaded_document(self, file, filename):
         """
         Process uploaded PDF document: save, extract text and tables
@@ -304,11 +388,19 @@ class DocumentProcessingHandler:
         """
         try:
             # Save file
-            file_path = self.save_uploaded_file(file, filename)
+            file_path, file_size = self.save_uploaded_file(file, filename)
+            
+            # Reuse a previous extraction of identical content
+            content_hash = self._file_sha256(file_path)
+            result = self._load_cached_result(content_hash)
             
-            # Process document
-            logger.info(f"Processing document for text and table extraction: {filename}")
-            result = self.process_document(file_path)
+            if result is not None:
+                logger.info(f"Using cached extraction for: {filename} ({content_hash[:12]})")
+            else:
+                # Process document
+                logger.info(f"Processing document for text and table extraction: {filename}")
+                result = self.process_document(file_path)
+                self._save_cached_result(content_hash, result)
             
             # Format extracted data for database
             extracted_data = {
@@ -323,7 +415,7 @@ class DocumentProcessingHandler:
                 'parameters_list': None,  # No parameters list
                 'refined_text': result['document_text'],
                 'file_path': file_path,
-                'file_size': os.path.getsize(file_path)
+                'file_size': file_size
             }
         except Exception as e:
             logger.error(f"Error processing uploaded document: {str(e)}")
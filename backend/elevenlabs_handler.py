@@ -5,19 +5,35 @@ Uses Cloudflare Tunnel for webhook URLs
 """
 from elevenlabs.client import ElevenLabs
 from config import ELEVENLABS_API_KEY, ELEVENLABS_AGENT_ID, ELEVENLABS_WEBHOOK_SECRET, WEBHOOK_BASE_URL, ELEVENLABS_CALL_ENDPOINT
+from config import ELEVENLABS_MAX_CONCURRENT_CALLS, ELEVENLABS_CALLS_PER_SECOND
 from config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
 from database import Database
-from twilio.rest import Client as TwilioClient
+from voice_handler import get_twilio_client, YES_RE, NO_RE
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import hmac
 import hashlib
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# orjson works directly on bytes and is several times faster than json; optional
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+    logger.warning("orjson not installed, using json. Install with: pip install orjson")
+
 # List of questions for the agent to ask (passed dynamically)
 LIST_OF_QUESTIONS = [
     "Has an Enduring Power of Attorney been enacted for this client?",
@@ -27,6 +43,245 @@ LIST_OF_QUESTIONS = [
     "Has the client been offered cultural support, and did they accept or decline it?"
 ]
 
+# Survey instructions sent to the agent with each outbound call
+CONVERSATION_CONTEXT_TEMPLATE = """You are conducting a survey call. Ask the following questions one by one and wait for yes/no answers:
+
+{questions_text}
+
+After each answer, acknowledge it and move to the next question. When all questions are answered, thank the caller and end the call."""
+
+# Process-wide ElevenLabs HTTP session (see get_http_session)
+_http_session = None
+_http_session_lock = threading.Lock()
+
+# Worker pool for ElevenLabs REST calls that can overlap with other work in the same request
+_HTTP_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix='elevenlabs-http')
+# Background writes the webhook response doesn't need to wait for (one worker keeps them in arrival order)
+_DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='elevenlabs-db')
+# Most writes _DB_EXECUTOR may have queued or running; past this, new ones are dropped (see _submit_db)
+MAX_PENDING_DB_WRITES = 10000
+_db_write_slots = threading.BoundedSemaphore(MAX_PENDING_DB_WRITES)
+# Upper bound on questions_cache entries - calls whose call_ended webhook never arrives age out
+MAX_CACHE_ENTRIES = 4096
+# Entries also expire after an hour; expired ones are swept every CACHE_SWEEP_INTERVAL webhooks
+CACHE_ENTRY_TTL = 3600
+CACHE_SWEEP_INTERVAL = 100
+
+# How long the agent's phone number lookup is reused before listing numbers again
+PHONE_NUMBER_CACHE_TTL = 3600
+# A lookup that found no usable number is remembered for a minute so misconfigured agents fail fast
+NO_PHONE_NUMBER_CACHE_TTL = 60
+# Agents whose phone number lookup is kept (least recently fetched dropped first)
+MAX_PHONE_NUMBER_ENTRIES = 128
+NO_PHONE_NUMBER_ERROR = "No phone numbers found in your ElevenLabs account. Please assign a phone number to your agent in the ElevenLabs dashboard."
+# Signed conversation URLs expire after ~15 minutes; refresh well before that
+SIGNED_URL_TTL = 600
+
+# Fetched post-call transcripts are reused this long, so retried webhooks don't fetch them again
+TRANSCRIPT_CACHE_TTL = 300
+MAX_TRANSCRIPT_ENTRIES = 256
+
+# Signed webhooks older than this (seconds) are rejected as replays
+WEBHOOK_SIGNATURE_TOLERANCE = 1800
+
+# Number of distinct question sets whose formatted context is kept (see _build_context)
+MAX_CONTEXT_CACHE_ENTRIES = 256
+
+# (connect, read) timeouts for ElevenLabs REST calls - a stuck connect fails fast and the adapter retries it
+API_READ_TIMEOUT = (2, 8)     # lookups (GET)
+API_WRITE_TIMEOUT = (2, 13)   # creates and updates (POST/PATCH/DELETE)
+
+# Upper bound on waiting for the background tool update (tools list, delete and create)
+TOOL_UPDATE_TIMEOUT = 35
+
+# How long an outbound call request waits for a free slot (ELEVENLABS_MAX_CONCURRENT_CALLS) before failing
+CALL_SLOT_TIMEOUT = 30
+
+# How much of a transcribed utterance is scanned for a yes/no answer
+ANSWER_SCAN_CHARS = 200
+
+
+# Webhook field aliases, in lookup order
+_EVENT_TYPE_KEYS = ('event_type', 'eventType', 'type', 'event')
+_CALL_ID_KEYS = ('call_id', 'callId')
+_QUESTION_NUM_KEYS = ('question_num', 'questionNum', 'question_index')
+_METADATA_KEYS = ('metadata', 'meta')
+_ROLE_KEYS = ('role', 'speaker')
+_MESSAGE_TEXT_KEYS = ('message', 'text', 'content')
+# Transcript line prefixes for the usual roles; others are upper-cased as they come
+_ROLE_PREFIXES = {'agent': 'AGENT: ', 'user': 'USER: ', 'system': 'SYSTEM: '}
+
+# Webhook field locations across payload shapes (post_call_transcription nests everything under data.data), in lookup order
+_DYNAMIC_CONVERSATION_ID = ('conversation_initiation_client_data', 'dynamic_variables', 'system__conversation_id')
+_CONVERSATION_ID_PATHS = (
+    ('data',) + _DYNAMIC_CONVERSATION_ID,
+    ('data', 'data') + _DYNAMIC_CONVERSATION_ID,
+    ('conversation_id',), ('conversationId',),
+    ('metadata', 'conversation_id'), ('metadata', 'conversationId'),
+    ('meta', 'conversation_id'), ('meta', 'conversationId'),
+    ('conversation', 'id'),
+    _DYNAMIC_CONVERSATION_ID,
+)
+_CALL_SID_PATHS = (
+    ('metadata', 'call_sid'), ('metadata', 'callSid'),
+    ('meta', 'call_sid'), ('meta', 'callSid'),
+    ('call_sid',), ('callSid',), ('sid',),
+)
+# A list is a message array; a string is a single user utterance
+_MESSAGES_PATHS = (
+    ('data', 'data', 'messages'), ('data', 'data', 'transcript'),
+    ('data', 'messages'), ('data', 'transcript'),
+    ('messages',), ('transcript',), ('transcription',),
+)
+
+
+def parse_json(raw):
+    """Decode a JSON body (bytes or str) - orjson when available, json otherwise"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dump_json(obj):
+    """Encode obj as compact JSON bytes - orjson when available, json otherwise"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def _json_preview(obj, limit, indent=False):
+    """JSON text of obj for logs, cut to `limit` characters (values json can't encode are str()'d)"""
+    if ORJSON_AVAILABLE:
+        options = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=str, option=options)[:limit].decode('utf-8', errors='ignore')
+    return json.dumps(obj, indent=2 if indent else None, default=str)[:limit]
+
+
+def _response_snippet(response, limit):
+    """Read at most `limit` bytes of a streamed response body as text and release the connection"""
+    try:
+        chunk = next(response.iter_content(limit), b'')
+    except Exception:
+        chunk = b''
+    finally:
+        response.close()
+    return chunk.decode(response.encoding or 'utf-8', errors='replace') or "No response body"
+
+
+def _cache_key(call_id):
+    """questions_cache key for a call: call ids arrive as int (DB) or str (metadata), the cache uses str"""
+    return str(call_id) if call_id is not None and call_id != '' else None
+
+
+def _first_present(d, keys):
+    """Return the first truthy value in d for the given keys, or None"""
+    for key in keys:
+        value = d.get(key)
+        if value:
+            return value
+    return None
+
+
+def _dig(d, path):
+    """Follow a key path through nested dicts; None if a step is missing or not a dict"""
+    for key in path:
+        if not isinstance(d, dict):
+            return None
+        d = d.get(key)
+    return d
+
+
+def _first_path(d, paths):
+    """Return the first truthy value found along the given key paths, or None"""
+    for path in paths:
+        value = _dig(d, path)
+        if value:
+            return value
+    return None
+
+
+def _first_in(dicts, keys):
+    """Like _first_present, searching each dict in turn (e.g. metadata before the payload root)"""
+    for d in dicts:
+        value = _first_present(d, keys)
+        if value:
+            return value
+    return None
+
+
+def extract_messages(data):
+    """
+    Transcript messages of a webhook payload from the first of _MESSAGES_PATHS that holds any
+    (a string is a single user utterance); returns (messages, path), or ([], None) if none is found
+    """
+    for path in _MESSAGES_PATHS:
+        found = _dig(data, path)
+        if isinstance(found, list) and found:
+            messages = found
+        elif isinstance(found, str) and found:
+            messages = [{'role': 'user', 'message': found}]
+        else:
+            continue
+        return messages, path
+    return [], None
+
+
+def _extract_role_text(msg):
+    """(role, text) of a transcript message; a bare string is a user utterance, anything else gives (None, None)"""
+    if isinstance(msg, dict):
+        return _first_present(msg, _ROLE_KEYS), _first_present(msg, _MESSAGE_TEXT_KEYS)
+    if isinstance(msg, str):
+        return 'user', msg
+    return None, None
+
+
+def _webhook_log_body(raw_json, data):
+    """webhook_logs text for a webhook: the body as received, or data serialized once for dict input"""
+    if isinstance(raw_json, (bytes, bytearray)):
+        return raw_json.decode('utf-8', errors='replace')
+    return raw_json or dump_json(data).decode('utf-8')
+
+
+def _submit_db(fn, *args, **kwargs):
+    """
+    Queue fn on _DB_EXECUTOR and return its Future - or, when MAX_PENDING_DB_WRITES writes are
+    already waiting (the database has stalled), log and drop it and return None
+    """
+    if not _db_write_slots.acquire(blocking=False):
+        logger.error("DB write queue full (%d pending); dropping %s", MAX_PENDING_DB_WRITES, fn.__name__)
+        return None
+    try:
+        future = _DB_EXECUTOR.submit(fn, *args, **kwargs)
+    except Exception:
+        _db_write_slots.release()
+        raise
+    future.add_done_callback(lambda _: _db_write_slots.release())
+    return future
+
+
+def get_http_session():
+    """
+    Return the process-wide ElevenLabs HTTP session, creating it on first use
+    Keeps TCP/TLS connections alive between calls; urllib3 does not retry POSTs on status codes,
+    so an outbound call is never placed twice
+    """
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                # Every ElevenLabs endpoint takes and returns JSON, so the headers are set once on the session
+                session.headers.update({'Content-Type': 'application/json', 'Accept': 'application/json'})
+                if ELEVENLABS_API_KEY:
+                    session.headers['xi-api-key'] = ELEVENLABS_API_KEY
+                session.mount('https://', HTTPAdapter(
+                    pool_connections=10,
+                    pool_maxsize=20,
+                    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 502, 503, 504])
+                ))
+                _http_session = session
+    return _http_session
+
 
 class ElevenLabsHandler:
     def __init__(self):
@@ -36,7 +291,50 @@ class ElevenLabsHandler:
         self.webhook_url = WEBHOOK_BASE_URL  # This will be your Cloudflare Tunnel URL
         
         # In-memory cache for questions (used when database is unavailable)
-        self.questions_cache = {}
+        # One entry per call keyed by str(call_id): {'call_id', 'questions', 'context', 'phone_id',
+        # 'conversation_id', 'call_sid'}; bounded LRU of (expires_at, value) (see _cache_set)
+        self.questions_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._webhook_count = 0
+        
+        # Reverse mappings for webhook lookups: conversation_id / call_sid -> str(call_id), bounded LRU (see _index_call)
+        self._conv_to_call = OrderedDict()
+        self._sid_to_call = OrderedDict()
+        
+        # Pooled HTTP session for ElevenLabs REST calls, shared by every handler instance
+        self.http = get_http_session()
+        
+        # agent_id -> (phone_number_id, phone_number, fetched at), bounded LRU (see _get_agent_phone_number)
+        self._phone_numbers = OrderedDict()
+        
+        # agent_id -> (WebSocket URL, fetched at) (see get_signed_ws_url)
+        self._signed_urls = {}
+        
+        # tuple of question texts -> (questions_text, conversation_context) (see _build_context)
+        self._context_cache = OrderedDict()
+        
+        # conversation_id -> (messages, fetched at), bounded LRU; plus a [lock, users] pair per conversation
+        # being fetched so concurrent retries wait for one request (see _fetch_transcript_messages)
+        self._transcripts = OrderedDict()
+        self._transcript_locks = {}
+        
+        # Outbound call limits (see _post_outbound_call)
+        self._call_slots = threading.BoundedSemaphore(max(1, ELEVENLABS_MAX_CONCURRENT_CALLS))
+        self._call_interval = 1.0 / ELEVENLABS_CALLS_PER_SECOND if ELEVENLABS_CALLS_PER_SECOND > 0 else 0.0
+        self._next_call_at = 0.0
+        self._rate_lock = threading.Lock()
+        
+        # Webhook event type -> handler; each returns (conversation_id, pending), where pending is a Future
+        # for work still running in the background that decides the webhook's outcome, or None
+        self._event_handlers = {
+            'call_started': self._handle_call_started,
+            'call.started': self._handle_call_started,
+            'call_ended': self._handle_call_ended,
+            'call.ended': self._handle_call_ended,
+            'transcription': self._handle_transcription,
+            'transcription.completed': self._handle_transcription,
+            'post_call_transcription': self._handle_transcription,
+        }
         
         # Initialize database (optional - continue if fails)
         try:
@@ -61,7 +359,7 @@ class ElevenLabsHandler:
         # Initialize Twilio client for call initiation (ElevenLabs requires Twilio for outbound calls)
         if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
             try:
-                self.twilio_client = TwilioClient(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+                self.twilio_client = get_twilio_client()
                 self.twilio_phone = TWILIO_PHONE_NUMBER
             except Exception as e:
                 logger.warning(f"Twilio client initialization failed: {str(e)}")
@@ -70,6 +368,31 @@ class ElevenLabsHandler:
             logger.warning("Twilio credentials not configured - required for ElevenLabs outbound calls")
             self.twilio_client = None
     
+    def start_warmup(self):
+        """
+        Open the ElevenLabs/Twilio connections in the background so the first call skips the TLS handshake
+        Makes real network calls, so only the server calls this at startup - not scripts or tests
+        """
+        threading.Thread(target=self._warmup, name='elevenlabs-warmup', daemon=True).start()
+    
+    def _warmup(self):
+        """Pre-connect the pooled HTTP sessions (and prime the phone number and signed URL caches)"""
+        if self.api_key and self.agent_id:
+            # Run both lookups concurrently, as initiate_call does, so two pooled connections are open
+            signed_url_future = _HTTP_POOL.submit(self.get_signed_ws_url)
+            try:
+                self._get_agent_phone_number()
+                signed_url_future.result(timeout=15)
+            except Exception as e:
+                logger.warning(f"ElevenLabs warmup failed: {str(e)}")
+        
+        twilio_session = getattr(getattr(self.twilio_client, 'http_client', None), 'session', None)
+        if twilio_session is not None:
+            try:
+                twilio_session.head('https://api.twilio.com/', timeout=5)
+            except Exception as e:
+                logger.warning(f"Twilio warmup failed: {str(e)}")
+    
     def initiate_call(self, to_number, call_id, questions):
         """
         Initiate a voice call using ElevenLabs Voice Agent API directly
@@ -84,93 +407,57 @@ class ElevenLabsHandler:
             raise Exception("ElevenLabs Agent ID not configured.")
         
         try:
-            # Store questions in cache
-            call_id_str = str(call_id)
-            self.questions_cache[call_id_str] = questions
-            if call_id_str.isdigit():
-                self.questions_cache[int(call_id_str)] = questions
-            if call_id != call_id_str and call_id not in self.questions_cache:
-                self.questions_cache[call_id] = questions
-            logger.info(f"Questions cached for ElevenLabs call_id {call_id_str}: {len(questions)} questions")
+            # Cache everything about this call in one entry keyed by the string call_id
+            call_id_str = _cache_key(call_id)
+            call_entry = {'call_id': call_id, 'questions': questions}
+            self._cache_set(call_id_str, call_entry)
+            logger.info("Questions cached for ElevenLabs call_id %s: %d questions", call_id_str, len(questions))
             
-            # Try to store questions in database
+            # Store questions in database in the background - overlaps the tool update, phone lookup and
+            # outbound POST below. Transcript answers are saved on the same single worker, so they queue behind
+            # this insert; handle_tool_call saves on the request thread and waits on 'questions_saved' first.
             if self.db_available and self.db:
-                try:
-                    for idx, question in enumerate(questions):
-                        self.db.save_question(call_id, question.get('text', ''), idx)
-                except Exception as db_error:
-                    logger.warning(f"Database not available, using cache: {str(db_error)}")
+                call_entry['questions_saved'] = _submit_db(self._save_questions, call_id, questions)
             
-            # Format questions for ElevenLabs agent
-            questions_text = "\n".join([f"Question {i+1}: {q.get('text', '')}" for i, q in enumerate(questions)])
-            conversation_context = f"""You are conducting a survey call. Ask the following questions one by one and wait for yes/no answers:
+            # Format questions for ElevenLabs agent (cached per question set)
+            questions_text, conversation_context = self._build_context(questions)
             
-{questions_text}
-
-After each answer, acknowledge it and move to the next question. When all questions are answered, thank the caller and end the call."""
-            
-            # Store context in cache
-            self.questions_cache[f'{call_id_str}_context'] = conversation_context
+            call_entry['context'] = conversation_context
             
             # Update form submission tool with actual number of questions
+            # (runs on the HTTP pool while the phone number is looked up below)
             num_questions = len(questions)
+            tool_future = None
             if num_questions > 0:
-                try:
-                    self.create_form_submission_tool(self.agent_id, num_questions)
-                    logger.info(f"✅ Updated form submission tool with {num_questions} question properties")
-                except Exception as tool_error:
-                    logger.warning(f"Could not update form submission tool (continuing anyway): {str(tool_error)}")
+                tool_future = _HTTP_POOL.submit(self.create_form_submission_tool, self.agent_id, num_questions)
             
-            # Get the ElevenLabs phone number assigned to the agent
-            phone_number_id = None
-            elevenlabs_phone_number = None
+            # Warm the signed WebSocket URL for the voice-flow webhook in parallel (cached per agent,
+            # errors are handled inside, so nothing waits on this); skipped while the cached one is fresh
+            if not self._signed_url_is_fresh(self.agent_id):
+                _HTTP_POOL.submit(self.get_signed_ws_url)
             
-            try:
-                phone_numbers_response = requests.get(
-                    'https://api.elevenlabs.io/v1/convai/phone-numbers',
-                    headers={'xi-api-key': self.api_key},
-                    timeout=10
-                )
-                
-                if phone_numbers_response.status_code == 200:
-                    phone_numbers = phone_numbers_response.json()
-                    # Find phone number assigned to this agent
-                    for pn in phone_numbers:
-                        assigned_agent = pn.get('assigned_agent', {})
-                        if assigned_agent.get('agent_id') == self.agent_id:
-                            elevenlabs_phone_number = pn.get('phone_number')
-                            phone_number_id = pn.get('phone_number_id')
-                            logger.info(f"Found ElevenLabs phone number {elevenlabs_phone_number} (ID: {phone_number_id}) for agent {self.agent_id}")
-                            break
-                    
-                    if not phone_number_id:
-                        # If no phone number found for this agent, try using the first available phone number
-                        if phone_numbers and len(phone_numbers) > 0:
-                            phone_number_id = phone_numbers[0].get('phone_number_id')
-                            elevenlabs_phone_number = phone_numbers[0].get('phone_number')
-                            logger.warning(f"No phone number assigned to agent {self.agent_id}, using first available: {elevenlabs_phone_number}")
-                        else:
-                            raise Exception("No phone numbers found in your ElevenLabs account. Please assign a phone number to your agent in the ElevenLabs dashboard.")
-                else:
-                    error_msg = phone_numbers_response.text[:200] if phone_numbers_response.text else "Unknown error"
-                    logger.error(f"Failed to fetch phone numbers: Status {phone_numbers_response.status_code}, Error: {error_msg}")
-                    raise Exception(f"Failed to fetch phone numbers from ElevenLabs: {error_msg}")
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching phone numbers: {str(e)}")
-                raise Exception(f"Failed to connect to ElevenLabs API: {str(e)}")
+            # Get the ElevenLabs phone number assigned to the agent (cached per handler)
+            phone_number_id, elevenlabs_phone_number = self._get_agent_phone_number()
             
             if not phone_number_id:
                 raise Exception("No phone number found for this agent. Please assign a phone number to your agent in the ElevenLabs dashboard.")
             
-            # Store phone number ID in cache
-            self.questions_cache[f'{call_id_str}_phone_id'] = phone_number_id
+            call_entry['phone_id'] = phone_number_id
+            
+            # The agent's tool must be updated before the call connects
+            if tool_future is not None:
+                try:
+                    tool_future.result(timeout=TOOL_UPDATE_TIMEOUT)
+                    logger.info(f"✅ Updated form submission tool with {num_questions} question properties")
+                except Exception as tool_error:
+                    logger.warning(f"Could not update form submission tool (continuing anyway): {str(tool_error)}")
             
             # IMPORTANT: Use ElevenLabs' native Twilio outbound call endpoint
             # This is the correct endpoint for making outbound calls via Twilio integration
             # Endpoint: /v1/convai/twilio/outbound-call
             try:
                 logger.info(f"Initiating ElevenLabs outbound call via Twilio integration")
-                logger.info(f"Agent ID: {self.agent_id}, Phone Number ID: {phone_number_id}, To: {to_number}")
+                logger.info("Agent ID: %s, Phone Number ID: %s, To: %s", self.agent_id, phone_number_id, to_number)
                 
                 # Prepare client data with questions for the agent
                 # This data will be available to the agent during the conversation
@@ -191,40 +478,56 @@ After each answer, acknowledge it and move to the next question. When all questi
                     'conversation_initiation_client_data': client_data  # Pass questions to agent
                 }
                 
-                headers = {
-                    'xi-api-key': self.api_key,
-                    'Content-Type': 'application/json'
-                }
+                logger.info("Calling ElevenLabs outbound endpoint: %s (%d questions)", outbound_url, len(questions))
+                payload_json = dump_json(payload)
+                # The full payload (every question and the whole context) is only logged at DEBUG
+                debug_enabled = logger.isEnabledFor(logging.DEBUG)
+                if debug_enabled:
+                    logger.debug("Payload: %s", payload_json.decode('utf-8'))
                 
-                logger.info(f"Calling ElevenLabs outbound endpoint: {outbound_url}")
-                logger.info(f"Payload: {json.dumps(payload, indent=2)}")
+                response = self._post_outbound_call(outbound_url, payload_json)
                 
-                response = requests.post(outbound_url, headers=headers, json=payload, timeout=15)
+                if response.status_code in (404, 422):
+                    # The cached phone number may have been unassigned or deleted - look it up again and retry once
+                    self._invalidate_phone_number()
+                    fresh_phone_number_id, _ = self._get_agent_phone_number()
+                    if fresh_phone_number_id and fresh_phone_number_id != phone_number_id:
+                        logger.warning(f"Phone number ID changed ({phone_number_id} -> {fresh_phone_number_id}), retrying outbound call")
+                        phone_number_id = fresh_phone_number_id
+                        call_entry['phone_id'] = phone_number_id
+                        payload['agent_phone_number_id'] = phone_number_id
+                        payload_json = dump_json(payload)
+                        response.close()
+                        response = self._post_outbound_call(outbound_url, payload_json)
                 
-                logger.info(f"Response status: {response.status_code}")
-                logger.info(f"Response headers: {dict(response.headers)}")
-                response_text = response.text[:1000] if response.text else "No response body"
-                logger.info(f"Response body: {response_text}")
+                logger.info("Response status: %s", response.status_code)
+                if debug_enabled:
+                    # CaseInsensitiveDict has its own repr - no dict() copy, formatted only when emitted
+                    logger.debug("Response headers: %s", response.headers)
+                # Success bodies are small JSON and read in full; error pages (e.g. proxy 502 HTML) only up to the log limit
+                if response.status_code in [200, 201, 202]:
+                    response_text = response.content[:1000].decode('utf-8', errors='replace') or "No response body"
+                else:
+                    response_text = _response_snippet(response, 1000)
+                logger.info("Response body: %s", response_text)
                 
                 if response.status_code in [200, 201, 202]:
                     try:
-                        result = response.json()
+                        result = parse_json(response.content)
                         conversation_id = result.get('conversation_id')
                         call_sid = result.get('call_sid')
                         
                         logger.info(f"✅ ElevenLabs outbound call initiated successfully!")
-                        logger.info(f"Conversation ID: {conversation_id}, Call SID: {call_sid}")
+                        logger.info("Conversation ID: %s, Call SID: %s", conversation_id, call_sid)
                         
                         # Store conversation ID and call SID for webhook tracking
-                        # Store both forward (call_id -> conversation_id) and reverse (conversation_id -> call_id) mappings
-                        self.questions_cache[f'{call_id_str}_conversation_id'] = conversation_id
-                        self.questions_cache[f'{call_id_str}_call_sid'] = call_sid
-                        self.questions_cache[f'{call_id_str}_context'] = conversation_context
+                        # Store both forward (call_id -> conversation_id) and reverse (conversation_id/call_sid -> call_id) mappings
+                        call_entry['conversation_id'] = conversation_id
+                        call_entry['call_sid'] = call_sid
                         
-                        # Reverse mapping: conversation_id -> call_id (for webhook lookup)
-                        if conversation_id:
-                            self.questions_cache[f'conv_{conversation_id}_call_id'] = call_id_str
-                            logger.info(f"Stored reverse mapping: conversation_id={conversation_id} -> call_id={call_id_str}")
+                        # Reverse mappings (for webhook lookup)
+                        self._index_call(call_id_str, conversation_id, call_sid)
+                        logger.info("Stored reverse mapping: conversation_id=%s, call_sid=%s -> call_id=%s", conversation_id, call_sid, call_id_str)
                         
                         # Return call identifier (prefer call_sid, then conversation_id, then our call_id)
                         return call_sid or conversation_id or call_id_str
@@ -261,184 +564,299 @@ After each answer, acknowledge it and move to the next question. When all questi
             logger.error(f"Error initiating ElevenLabs call: {str(e)}")
             raise
     
+    def _cache_set(self, key, value):
+        """
+        Store a questions_cache entry for CACHE_ENTRY_TTL seconds,
+        evicting the least recently used past MAX_CACHE_ENTRIES
+        """
+        with self._cache_lock:
+            self.questions_cache[key] = (time.monotonic() + CACHE_ENTRY_TTL, value)
+            self.questions_cache.move_to_end(key)
+            while len(self.questions_cache) > MAX_CACHE_ENTRIES:
+                self.questions_cache.popitem(last=False)
+    
+    def _cache_get(self, key, default=None):
+        """Read a questions_cache entry and mark it recently used (expired entries are dropped)"""
+        with self._cache_lock:
+            entry = self.questions_cache.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self.questions_cache[key]
+                return default
+            self.questions_cache.move_to_end(key)
+            return entry[1]
+    
+    def _cache_pop(self, key):
+        """Remove a questions_cache entry if present"""
+        with self._cache_lock:
+            self.questions_cache.pop(key, None)
+    
+    def get_cached_call(self, call_id):
+        """The cached entry for a call ({'questions', 'context', ...}), or None if it is not cached"""
+        return self._cache_get(_cache_key(call_id))
+    
+    def forget_call(self, call_id):
+        """Drop a call's cached entry (e.g. when its agent session ends)"""
+        self._cache_pop(_cache_key(call_id))
+    
+    def _index_call(self, call_id_str, conversation_id=None, call_sid=None):
+        """Record conversation_id / call_sid -> call_id, evicting the oldest past MAX_CACHE_ENTRIES"""
+        if not call_id_str:
+            return
+        with self._cache_lock:
+            for index, key in ((self._conv_to_call, conversation_id), (self._sid_to_call, call_sid)):
+                if key:
+                    index[key] = call_id_str
+                    index.move_to_end(key)
+                    while len(index) > MAX_CACHE_ENTRIES:
+                        index.popitem(last=False)
+    
+    def _lookup_call_id(self, conversation_id=None, call_sid=None):
+        """Return the str call_id recorded for a conversation_id or call_sid, or None"""
+        with self._cache_lock:
+            return (self._conv_to_call.get(conversation_id) if conversation_id else None) or \
+                (self._sid_to_call.get(call_sid) if call_sid else None)
+    
+    def _cache_items(self):
+        """Snapshot of the unexpired (key, value) pairs in questions_cache"""
+        now = time.monotonic()
+        with self._cache_lock:
+            return [(key, entry[1]) for key, entry in self.questions_cache.items() if entry[0] >= now]
+    
+    def _sweep_expired(self):
+        """
+        Drop expired entries from the least recently used end of questions_cache
+        Recency roughly follows insertion order, so stop at the first live entry
+        """
+        now = time.monotonic()
+        with self._cache_lock:
+            while self.questions_cache:
+                key, entry = next(iter(self.questions_cache.items()))
+                if entry[0] >= now:
+                    break
+                del self.questions_cache[key]
+    
+    def _build_context(self, questions):
+        """
+        Return (questions_text, conversation_context) for a question list
+        Surveys mostly reuse the same questions, so results are cached by question text (LRU)
+        """
+        key = tuple(q.get('text', '') for q in questions)
+        with self._cache_lock:
+            cached = self._context_cache.get(key)
+            if cached is not None:
+                self._context_cache.move_to_end(key)
+                return cached
+        
+        questions_text = "\n".join(f"Question {i+1}: {text}" for i, text in enumerate(key))
+        cached = (questions_text, CONVERSATION_CONTEXT_TEMPLATE.format(questions_text=questions_text))
+        with self._cache_lock:
+            self._context_cache[key] = cached
+            while len(self._context_cache) > MAX_CONTEXT_CACHE_ENTRIES:
+                self._context_cache.popitem(last=False)
+        return cached
+    
+    def _post_outbound_call(self, outbound_url, payload_json):
+        """
+        POST an outbound call request, holding one of ELEVENLABS_MAX_CONCURRENT_CALLS slots
+        and spacing requests to at most ELEVENLABS_CALLS_PER_SECOND
+        """
+        if not self._call_slots.acquire(timeout=CALL_SLOT_TIMEOUT):
+            raise Exception(f"Too many outbound calls in progress (limit {ELEVENLABS_MAX_CONCURRENT_CALLS}). Please try again shortly.")
+        try:
+            with self._rate_lock:
+                now = time.monotonic()
+                wait = self._next_call_at - now
+                self._next_call_at = max(now, self._next_call_at) + self._call_interval
+            if wait > 0:
+                time.sleep(wait)
+            # Streamed so error responses can be read partially (see _response_snippet)
+            return self.http.post(outbound_url, data=payload_json, timeout=API_WRITE_TIMEOUT, stream=True)
+        finally:
+            self._call_slots.release()
+    
+    def _get_agent_phone_number(self, agent_id=None):
+        """
+        Return (phone_number_id, phone_number) for the agent's ElevenLabs number
+        The lookup is cached per agent for PHONE_NUMBER_CACHE_TTL seconds - the assignment rarely changes;
+        initiate_call invalidates it when the outbound endpoint rejects the number (see _invalidate_phone_number).
+        Raises if the account has no usable number (remembered for NO_PHONE_NUMBER_CACHE_TTL seconds)
+        """
+        agent_id = agent_id or self.agent_id
+        cached = self._phone_numbers.get(agent_id)
+        if cached:
+            age = time.monotonic() - cached[2]
+            if cached[0] and age < PHONE_NUMBER_CACHE_TTL:
+                return cached[0], cached[1]
+            if not cached[0] and age < NO_PHONE_NUMBER_CACHE_TTL:
+                raise Exception(NO_PHONE_NUMBER_ERROR)
+        
+        phone_number_id = None
+        elevenlabs_phone_number = None
+        
+        try:
+            phone_numbers_response = self.http.get(
+                'https://api.elevenlabs.io/v1/convai/phone-numbers',
+                timeout=API_READ_TIMEOUT
+            )
+            
+            if phone_numbers_response.status_code == 200:
+                phone_numbers = parse_json(phone_numbers_response.content)
+                # Find phone number assigned to this agent
+                for pn in phone_numbers:
+                    assigned_agent = pn.get('assigned_agent', {})
+                    if assigned_agent.get('agent_id') == agent_id:
+                        elevenlabs_phone_number = pn.get('phone_number')
+                        phone_number_id = pn.get('phone_number_id')
+                        logger.info(f"Found ElevenLabs phone number {elevenlabs_phone_number} (ID: {phone_number_id}) for agent {agent_id}")
+                        break
+                
+                if not phone_number_id:
+                    # If no phone number found for this agent, try using the first available phone number
+                    if phone_numbers and len(phone_numbers) > 0:
+                        phone_number_id = phone_numbers[0].get('phone_number_id')
+                        elevenlabs_phone_number = phone_numbers[0].get('phone_number')
+                        logger.warning(f"No phone number assigned to agent {agent_id}, using first available: {elevenlabs_phone_number}")
+            else:
+                error_msg = phone_numbers_response.content[:200].decode('utf-8', errors='replace') or "Unknown error"
+                logger.error(f"Failed to fetch phone numbers: Status {phone_numbers_response.status_code}, Error: {error_msg}")
+                raise Exception(f"Failed to fetch phone numbers from ElevenLabs: {error_msg}")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching phone numbers: {str(e)}")
+            raise Exception(f"Failed to connect to ElevenLabs API: {str(e)}")
+        
+        # Cached either way - a missing number is a (short-lived) negative entry
+        with self._cache_lock:
+            self._phone_numbers[agent_id] = (phone_number_id, elevenlabs_phone_number, time.monotonic())
+            self._phone_numbers.move_to_end(agent_id)
+            while len(self._phone_numbers) > MAX_PHONE_NUMBER_ENTRIES:
+                self._phone_numbers.popitem(last=False)
+        if not phone_number_id:
+            raise Exception(NO_PHONE_NUMBER_ERROR)
+        return phone_number_id, elevenlabs_phone_number
+    
+    def _invalidate_phone_number(self, agent_id=None):
+        """Drop the cached phone number so the next lookup lists the account's numbers again"""
+        self._phone_numbers.pop(agent_id or self.agent_id, None)
+    
+    def _signed_url_is_fresh(self, agent_id):
+        """True if a signed URL for the agent was fetched less than SIGNED_URL_TTL seconds ago"""
+        cached = self._signed_urls.get(agent_id)
+        return cached is not None and time.monotonic() - cached[1] < SIGNED_URL_TTL
+    
+    def get_signed_ws_url(self, agent_id=None):
+        """
+        Return the conversation WebSocket URL for the agent
+        A signed URL is reused for SIGNED_URL_TTL seconds (they stay valid ~15 minutes);
+        falls back to the direct URL for public agents when the key lacks permission
+        """
+        agent_id = agent_id or self.agent_id
+        if self._signed_url_is_fresh(agent_id):
+            return self._signed_urls[agent_id][0]
+        
+        direct_url = f'wss://api.elevenlabs.io/v1/convai/conversation?agent_id={agent_id}'
+        ws_url = None
+        try:
+            ws_url_response = self.http.get(
+                'https://api.elevenlabs.io/v1/convai/conversation/get-signed-url',
+                params={'agent_id': agent_id},
+                timeout=API_READ_TIMEOUT
+            )
+            if ws_url_response.status_code == 200:
+                ws_url = parse_json(ws_url_response.content).get('signed_url')
+            elif ws_url_response.status_code == 401:
+                # Missing permissions - use direct URL for public agents
+                logger.warning("Cannot get signed URL due to missing permissions, using direct WebSocket URL")
+                ws_url = direct_url
+        except Exception as e:
+            logger.warning(f"Error getting WebSocket URL: {str(e)}, using direct URL")
+            return direct_url
+        
+        if ws_url:
+            self._signed_urls[agent_id] = (ws_url, time.monotonic())
+        return ws_url
+    
     def handle_webhook(self, webhook_data):
         """
         Handle webhook events from ElevenLabs
         Events: call_started, call_ended, transcription, post_call_transcription, etc.
         """
+        # Reap cache entries for calls whose call_ended webhook never arrived
+        self._webhook_count += 1
+        if self._webhook_count % CACHE_SWEEP_INTERVAL == 0:
+            self._sweep_expired()
+        
         # Store original webhook data for logging
         original_webhook_data = webhook_data
-        log_id = None
+        raw_json = None
+        log_future = None
         error_message = None
+        conversation_id = call_sid = db_call_id = None
         
         try:
-            # Handle both JSON and form data
-            if isinstance(webhook_data, dict):
-                data = webhook_data
-            else:
-                data = webhook_data.to_dict() if hasattr(webhook_data, 'to_dict') else {}
+            # The webhook route hands in the raw JSON body (parsed here, in one pass) or already-decoded form fields
+            if isinstance(webhook_data, (bytes, bytearray, str)):
+                raw_json = webhook_data
+                webhook_data = original_webhook_data = parse_json(webhook_data)
+            data = webhook_data if isinstance(webhook_data, dict) else {}
+            
+            # Log full webhook data for debugging (truncated in terminal); skipped entirely above INFO
+            info_enabled = logger.isEnabledFor(logging.INFO)
+            if info_enabled:
+                logger.info("Webhook data received (first 1000 chars): %s...", _json_preview(data, 1000, indent=True))
             
-            # Log full webhook data for debugging (truncated in terminal)
-            webhook_json_str = json.dumps(data, indent=2, default=str)
-            logger.info(f"Webhook data received (first 1000 chars): {webhook_json_str[:1000]}...")
+            event_type = _first_present(data, _EVENT_TYPE_KEYS)
+            metadata = _first_present(data, _METADATA_KEYS) or {}
             
-            event_type = data.get('event_type') or data.get('eventType') or data.get('type') or data.get('event')
-            metadata = data.get('metadata', {}) or data.get('meta', {}) or {}
+            # Log what the agent was started with (debugging aid)
+            conv_init_data = _dig(data, ('data', 'conversation_initiation_client_data')) if info_enabled else None
+            if isinstance(conv_init_data, dict):
+                logger.info(f"📋 conversation_initiation_client_data keys: {list(conv_init_data.keys())}")
+                if 'override_first_message' in conv_init_data:
+                    first_msg = conv_init_data.get('override_first_message', '')
+                    logger.info(f"✅ Found override_first_message in conversation_initiation_client_data: {first_msg[:100]}...")
+                if 'override_prompt' in conv_init_data:
+                    override_prompt = conv_init_data.get('override_prompt', '')
+                    logger.info(f"✅ Found override_prompt in conversation_initiation_client_data: {len(override_prompt)} chars, preview: {override_prompt[:150]}...")
+                if 'questions' in conv_init_data:
+                    questions = conv_init_data.get('questions', [])
+                    logger.info(f"✅ Found questions in conversation_initiation_client_data: {len(questions)} questions")
+                    if questions and len(questions) > 0:
+                        logger.info(f"   First question: {questions[0].get('text', 'N/A')[:100]}")
+                if 'dynamic_variables' in conv_init_data:
+                    dyn_vars = conv_init_data.get('dynamic_variables', {})
+                    logger.info(f"✅ Found dynamic_variables: {list(dyn_vars.keys())}")
+                    if 'questions' in dyn_vars:
+                        logger.info(f"   dynamic_variables.questions exists (JSON string)")
+                    if 'question_list' in dyn_vars:
+                        logger.info(f"   dynamic_variables.question_list exists (JSON string array)")
             
             # Extract identifiers early for logging
-            conversation_id = None
             call_id = None
-            call_sid = None
-            
-            # Try to extract conversation_id early for logging
-            nested_data = data.get('data', {})
-            if isinstance(nested_data, dict):
-                conv_init_data = nested_data.get('conversation_initiation_client_data', {})
-                if isinstance(conv_init_data, dict):
-                    # Log the conversation_initiation_client_data to debug
-                    logger.info(f"📋 conversation_initiation_client_data keys: {list(conv_init_data.keys())}")
-                    if 'override_first_message' in conv_init_data:
-                        first_msg = conv_init_data.get('override_first_message', '')
-                        logger.info(f"✅ Found override_first_message in conversation_initiation_client_data: {first_msg[:100]}...")
-                    if 'override_prompt' in conv_init_data:
-                        override_prompt = conv_init_data.get('override_prompt', '')
-                        logger.info(f"✅ Found override_prompt in conversation_initiation_client_data: {len(override_prompt)} chars, preview: {override_prompt[:150]}...")
-                    if 'questions' in conv_init_data:
-                        questions = conv_init_data.get('questions', [])
-                        logger.info(f"✅ Found questions in conversation_initiation_client_data: {len(questions)} questions")
-                        if questions and len(questions) > 0:
-                            logger.info(f"   First question: {questions[0].get('text', 'N/A')[:100]}")
-                    if 'dynamic_variables' in conv_init_data:
-                        dyn_vars = conv_init_data.get('dynamic_variables', {})
-                        logger.info(f"✅ Found dynamic_variables: {list(dyn_vars.keys())}")
-                        if 'questions' in dyn_vars:
-                            logger.info(f"   dynamic_variables.questions exists (JSON string)")
-                        if 'question_list' in dyn_vars:
-                            logger.info(f"   dynamic_variables.question_list exists (JSON string array)")
-                        if isinstance(dyn_vars, dict):
-                            conversation_id = dyn_vars.get('system__conversation_id')
-            
-            # Fallback to other locations
-            if not conversation_id:
-                conversation_id = (
-                    data.get('conversation_id') or 
-                    data.get('conversationId') or 
-                    metadata.get('conversation_id') or 
-                    metadata.get('conversationId') or
-                    (data.get('conversation', {}).get('id') if isinstance(data.get('conversation'), dict) else None)
-                )
-            
-            call_sid = (
-                metadata.get('call_sid') or 
-                metadata.get('callSid') or 
-                data.get('call_sid') or 
-                data.get('callSid') or
-                data.get('sid')
-            )
-            
-            # Save complete webhook response to database BEFORE processing
-            # This ensures we capture the full data even if processing fails
-            if self.db_available and self.db:
-                try:
-                    log_id = self.db.save_webhook_log(
-                        event_type=event_type,
-                        conversation_id=conversation_id,
-                        call_id=None,  # Will be updated after we find it
-                        call_sid=call_sid,
-                        webhook_data=data,  # Save the parsed data dict
-                        processed_successfully=False,  # Will update to True at end if successful
-                        error_message=None
-                    )
-                    logger.info(f"✅ Saved webhook to logs table: log_id={log_id}, event_type={event_type}")
-                except Exception as log_error:
-                    logger.warning(f"Could not save webhook to logs table: {str(log_error)}")
-                    # Continue processing even if logging fails
-            
-            # Try multiple ways to get call/conversation identifier (if not already found)
-            # The webhook structure has conversation_id in nested locations
-            # First check nested structure: data.data.conversation_initiation_client_data.dynamic_variables.system__conversation_id
-            
-            # Check nested structure first (most common for post_call_transcription)
-            if not conversation_id:
-                nested_data = data.get('data', {})
-                if isinstance(nested_data, dict):
-                    conv_init_data = nested_data.get('conversation_initiation_client_data', {})
-                    if isinstance(conv_init_data, dict):
-                        dyn_vars = conv_init_data.get('dynamic_variables', {})
-                        if isinstance(dyn_vars, dict):
-                            conversation_id = dyn_vars.get('system__conversation_id')
-                            if conversation_id:
-                                logger.info(f"✅ Found conversation_id in nested structure: {conversation_id}")
-            
-            # Fallback to other locations if not found
-            if not conversation_id:
-                conversation_id = (
-                    data.get('conversation_id') or 
-                    data.get('conversationId') or 
-                    metadata.get('conversation_id') or 
-                    metadata.get('conversationId') or
-                    (data.get('conversation', {}).get('id') if isinstance(data.get('conversation'), dict) else None) or
-                    (data.get('conversation_initiation_client_data', {}).get('dynamic_variables', {}).get('system__conversation_id') if isinstance(data.get('conversation_initiation_client_data'), dict) else None)
-                )
+            conversation_id = _first_path(data, _CONVERSATION_ID_PATHS)
+            call_sid = _first_path(data, _CALL_SID_PATHS)
             
             # Get call_id from metadata/data (but don't use conversation_id as fallback yet)
-            call_id = (
-                metadata.get('call_id') or 
-                metadata.get('callId') or 
-                data.get('call_id') or 
-                data.get('callId')
-            )
+            call_id = _first_in((metadata, data), _CALL_ID_KEYS)
             
-            # Also try to get call_sid from webhook (might be different from conversation_id)
-            call_sid = (
-                metadata.get('call_sid') or 
-                metadata.get('callSid') or 
-                data.get('call_sid') or 
-                data.get('callSid') or
-                data.get('sid')
-            )
-            
-            # If we have conversation_id but not call_id, try to find it in cache
-            if conversation_id and not call_id:
-                # Try reverse mapping first (faster)
-                reverse_key = f'conv_{conversation_id}_call_id'
-                if reverse_key in self.questions_cache:
-                    call_id = self.questions_cache[reverse_key]
-                    logger.info(f"Found call_id {call_id} from conversation_id {conversation_id} via reverse mapping")
-                else:
-                    # Fallback: search cache for conversation_id to find our internal call_id
-                    for key, value in self.questions_cache.items():
-                        if isinstance(key, str) and key.endswith('_conversation_id') and value == conversation_id:
-                            # Extract call_id from cache key (e.g., "12345_conversation_id" -> "12345")
-                            call_id = key.replace('_conversation_id', '')
-                            logger.info(f"Found call_id {call_id} from conversation_id {conversation_id} in cache")
-                            # Store reverse mapping for future use
-                            self.questions_cache[f'conv_{conversation_id}_call_id'] = call_id
-                            break
+            # If we have conversation_id or call_sid but not call_id, try the reverse mappings
+            if not call_id:
+                call_id = self._lookup_call_id(conversation_id, call_sid)
+                if call_id:
+                    logger.info("Found call_id %s from conversation_id %s / call_sid %s via reverse mapping", call_id, conversation_id, call_sid)
             
-            # If still no call_id but we have call_sid, try database lookup
-            if not call_id and call_sid and self.db_available and self.db:
+            # If still no call_id, look it up in the database by call_sid, or by conversation_id stored as call_sid
+            if not call_id and (call_sid or conversation_id) and self.db_available and self.db:
                 try:
-                    db_call_id = self.db.get_call_id_by_sid(call_sid)
+                    db_call_id = self.db.get_call_id_by_sid_or_conv(call_sid, conversation_id)
                     if db_call_id:
                         call_id = db_call_id
-                        logger.info(f"✅ Found call_id {call_id} from call_sid {call_sid} via database lookup")
-                        # Store in cache for future use
-                        self.questions_cache[f'sid_{call_sid}_call_id'] = call_id
+                        logger.info("✅ Found call_id %s from call_sid %s / conversation_id %s via database lookup", call_id, call_sid, conversation_id)
+                        # Store reverse mappings for future use
+                        self._index_call(_cache_key(call_id), conversation_id, call_sid)
                 except Exception as db_lookup_error:
-                    logger.warning(f"Could not look up call_id by call_sid: {str(db_lookup_error)}")
-            
-            # If still no call_id but we have conversation_id, try using it as call_sid for database lookup
-            if not call_id and conversation_id and self.db_available and self.db:
-                try:
-                    db_call_id = self.db.get_call_id_by_sid(conversation_id)
-                    if db_call_id:
-                        call_id = db_call_id
-                        logger.info(f"✅ Found call_id {call_id} from conversation_id {conversation_id} via database lookup (as call_sid)")
-                        # Store in cache for future use
-                        self.questions_cache[f'conv_{conversation_id}_call_id'] = call_id
-                except Exception as db_lookup_error:
-                    logger.warning(f"Could not look up call_id by conversation_id: {str(db_lookup_error)}")
+                    logger.warning(f"Could not look up call_id by call_sid/conversation_id: {str(db_lookup_error)}")
             
             # Validate that call_id is numeric (database expects INT)
             # Store original value for logging purposes
@@ -457,483 +875,505 @@ After each answer, acknowledge it and move to the next question. When all questi
                     original_call_id_string = call_id
                     call_id = None  # Set to None so we don't try database operations
             
-            logger.info(f"ElevenLabs webhook received: event={event_type}, conversation_id={conversation_id}, call_id={call_id}, db_call_id={db_call_id}")
+            logger.info("ElevenLabs webhook received: event=%s, conversation_id=%s, call_id=%s, db_call_id=%s",
+                        event_type, conversation_id, call_id, db_call_id)
             
-            # Update webhook log with call_id if we found it (use string version for logging)
-            if log_id and self.db_available and self.db:
-                try:
-                    # Use db_call_id (integer) converted to string, or conversation_id for logging
-                    log_call_id = str(db_call_id) if db_call_id else (conversation_id if conversation_id else None)
-                    if log_call_id:
-                        update_query = """
-                        UPDATE webhook_logs 
-                        SET call_id = ?
-                        WHERE id = ?
-                        """
-                        self.db.execute(update_query, (log_call_id, log_id))
-                except Exception as update_error:
-                    logger.warning(f"Could not update webhook log with call_id: {str(update_error)}")
+            # Save complete webhook response to database BEFORE processing, with the call_id already resolved
+            # This ensures we capture the full data even if processing fails. The insert and the
+            # status update below run in order on the DB worker so the webhook is acknowledged without waiting on them
+            if self.db_available and self.db:
+                # Use db_call_id (integer) converted to string, or conversation_id for logging
+                log_call_id = str(db_call_id) if db_call_id else (conversation_id if conversation_id else None)
+                log_future = _submit_db(
+                    self.db.save_webhook_log,
+                    event_type=event_type,
+                    conversation_id=conversation_id,
+                    call_id=log_call_id,
+                    call_sid=call_sid,
+                    webhook_data=_webhook_log_body(raw_json, data),
+                    processed_successfully=False,  # Will update to True at end if successful
+                    error_message=None
+                )
             
-            if event_type == 'call_started' or event_type == 'call.started':
-                # Update call status in database (use db_call_id if available)
-                if self.db_available and self.db and db_call_id:
-                    try:
-                        # Get call_sid for update_call_status
-                        call_data = self.db.get_call_data(db_call_id)
-                        if call_data and call_data.get('call_sid'):
-                            self.db.update_call_status(call_data['call_sid'], 'in-progress')
-                    except Exception as db_error:
-                        logger.warning(f"Could not update call status: {str(db_error)}")
+            handler = self._event_handlers.get(event_type)
+            pending = None
+            if handler:
+                conversation_id, pending = handler(data, metadata, event_type, conversation_id, call_id, db_call_id)
             
-            elif event_type == 'call_ended' or event_type == 'call.ended':
-                # Mark call as completed (use db_call_id if available)
-                if self.db_available and self.db and db_call_id:
-                    try:
-                        self.db.complete_call(db_call_id)
-                    except Exception as db_error:
-                        logger.warning(f"Could not complete call: {str(db_error)}")
-                
-                # Clean up cache (use original call_id string if available)
-                cache_key = str(db_call_id) if db_call_id else (call_id if call_id else None)
-                if cache_key and cache_key in self.questions_cache:
-                    del self.questions_cache[cache_key]
+            # Use string version of call_id or conversation_id for logging
+            log_call_id = str(db_call_id) if db_call_id else (conversation_id if conversation_id else None)
+            if pending is not None:
+                # Background work still running - it records the outcome when it finishes
+                pending.add_done_callback(lambda done: self._finish_pending_webhook(done, log_future, log_call_id))
+            elif log_future:
+                # Mark webhook log as successfully processed
+                _submit_db(self._finish_webhook_log, log_future, log_call_id, True)
             
-            elif event_type == 'transcription' or event_type == 'transcription.completed' or event_type == 'post_call_transcription':
-                # Process transcription and extract answers
-                # The post_call_transcription webhook has a different structure:
-                # - data.data.messages[] - array of conversation messages
-                # - data.data.conversation_initiation_client_data.dynamic_variables.system__conversation_id
-                
-                # Get the messages array from the webhook
-                # The structure can be either:
-                # 1. { "data": { "data": { "messages": [...] } } } - nested
-                # 2. { "data": { "messages": [...] } } - direct
-                # 3. { "data": { "transcript": [...] } } - alternative field name
-                # 4. { "transcript": [...] } - root level transcript
-                messages_data = data.get('data', {})
-                messages = []
-                
+            return {'status': 'ok'}
+            
+        except Exception as e:
+            error_message = str(e)
+            logger.error(f"Error handling ElevenLabs webhook: {error_message}", exc_info=True)
+            
+            # Update webhook log with error message - or, if it was never saved, save it now with the error
+            if self.db_available and self.db:
+                # Use string version of call_id or conversation_id for logging
+                log_call_id = str(db_call_id) if db_call_id else (conversation_id if conversation_id else None)
+                # Try to extract basic info from original data
+                original_data = original_webhook_data if isinstance(original_webhook_data, dict) else {}
+                _submit_db(
+                    self._finish_webhook_log, log_future, log_call_id, False,
+                    error_message=error_message[:4000],  # Limit error message length
+                    event_type=_first_present(original_data, _EVENT_TYPE_KEYS[:2]) or 'unknown',
+                    conversation_id=conversation_id,
+                    call_sid=call_sid,
+                    webhook_data=_webhook_log_body(raw_json, original_data)
+                )
+            
+            return {'status': 'error', 'message': error_message}
+    
+    def _finish_webhook_log(self, log_future, call_id, processed_successfully, error_message=None, **new_row):
+        """
+        Record a webhook's outcome on the row inserted by log_future (runs on _DB_EXECUTOR, which is
+        single-threaded, so the insert has already finished). new_row holds the fields for a complete
+        row, written instead when there is no row to update; without them the outcome is only logged
+        """
+        try:
+            # The insert's own failure surfaces here, so it is logged like any other log write error
+            log_id = log_future.result() if log_future else None
+            if not log_id and not new_row:
+                logger.warning(f"Webhook log row was not saved; outcome not recorded: call_id={call_id}, "
+                               f"processed_successfully={processed_successfully}, error={error_message}")
+                return
+            self.db.upsert_webhook_log(log_id, call_id=call_id, processed_successfully=processed_successfully,
+                                       error_message=error_message, **new_row)
+        except Exception as log_error:
+            logger.warning(f"Could not record webhook log outcome: {str(log_error)}")
+    
+    def _finish_pending_webhook(self, pending, log_future, log_call_id):
+        """Log the outcome of a webhook's background work and record it on the webhook log (done callback of pending)"""
+        error = pending.exception()
+        if error is not None:
+            logger.error(f"Error in background webhook processing: {str(error)}", exc_info=error)
+        if log_future:
+            _submit_db(
+                self._finish_webhook_log, log_future, log_call_id, error is None,
+                error_message=str(error)[:4000] if error is not None else None  # Limit error message length
+            )
+    
+    def _handle_call_started(self, data, metadata, event_type, conversation_id, call_id, db_call_id):
+        """Mark the call in progress"""
+        # Update call status in database (use db_call_id if available) - in the background, like all webhook writes
+        if self.db_available and self.db and db_call_id:
+            _submit_db(self._mark_call_in_progress, db_call_id)
+        
+        return conversation_id, None
+    
+    def _mark_call_in_progress(self, db_call_id):
+        """Set the call's status to in-progress (runs on _DB_EXECUTOR)"""
+        try:
+            # Get call_sid for update_call_status
+            call_data = self.db.get_call_data(db_call_id)
+            if call_data and call_data.get('call_sid'):
+                self.db.update_call_status(call_data['call_sid'], 'in-progress')
+        except Exception as db_error:
+            logger.warning(f"Could not update call status: {str(db_error)}")
+    
+    def _handle_call_ended(self, data, metadata, event_type, conversation_id, call_id, db_call_id):
+        """Mark the call completed and drop its cached questions"""
+        # Mark call as completed (use db_call_id if available); queued behind any answers still being saved
+        if self.db_available and self.db and db_call_id:
+            _submit_db(self._complete_call, db_call_id)
+        
+        # Clean up cache (use original call_id string if available); the reverse mappings stay,
+        # since the post-call transcription webhook arrives after the call has ended
+        cache_key = _cache_key(db_call_id or call_id)
+        if cache_key:
+            self._cache_pop(cache_key)
+        
+        return conversation_id, None
+    
+    def _complete_call(self, db_call_id):
+        """Mark the call completed (runs on _DB_EXECUTOR)"""
+        try:
+            self.db.complete_call(db_call_id)
+        except Exception as db_error:
+            logger.warning(f"Could not complete call: {str(db_error)}")
+    
+    def _handle_transcription(self, data, metadata, event_type, conversation_id, call_id, db_call_id):
+        """
+        Process transcription events and extract answers
+        conversation_id was already resolved from every known location (see _CONVERSATION_ID_PATHS);
+        returns it for the webhook log update, with the Future of the background processing
+        (the transcript fetch, when it has to be fetched first)
+        """
+        # Process transcription and extract answers
+        # The post_call_transcription webhook has a different structure:
+        # - data.data.messages[] - array of conversation messages
+        # - data.data.conversation_initiation_client_data.dynamic_variables.system__conversation_id
+        
+        # Get the messages array from the webhook
+        # The structure can be either:
+        # 1. { "data": { "data": { "messages": [...] } } } - nested
+        # 2. { "data": { "messages": [...] } } - direct
+        # 3. { "data": { "transcript": [...] } } - alternative field name
+        # 4. { "transcript": [...] } - root level transcript
+        messages, path = extract_messages(data)
+        if messages:
+            logger.info(f"✅ Found messages in {'.'.join(path)}: {len(messages)} items")
+        else:
+            logger.warning("⚠️ No messages found in webhook at any known location")
+            # Log the structure for debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Webhook data keys: {list(data.keys())}")
+                messages_data = data.get('data')
                 if isinstance(messages_data, dict):
-                    # Check if there's a nested 'data' key (structure 1)
-                    inner_data = messages_data.get('data', {})
+                    logger.debug(f"data keys: {list(messages_data.keys())}")
+                    inner_data = messages_data.get('data')
                     if isinstance(inner_data, dict):
-                        # Try 'messages' first
-                        if 'messages' in inner_data:
-                            messages = inner_data.get('messages', [])
-                            logger.info(f"✅ Found messages in data.data.messages: {len(messages)} messages")
-                        # Try 'transcript' as alternative
-                        elif 'transcript' in inner_data:
-                            transcript_data = inner_data.get('transcript', [])
-                            if isinstance(transcript_data, list):
-                                messages = transcript_data
-                            elif isinstance(transcript_data, str):
-                                # Convert string transcript to messages format
-                                messages = [{'role': 'user', 'message': transcript_data}]
-                            logger.info(f"✅ Found transcript in data.data.transcript: {len(messages)} items")
-                        
-                        # Also extract conversation_id from this nested structure
-                        if not conversation_id:
-                            conv_init_data = inner_data.get('conversation_initiation_client_data', {})
-                            if isinstance(conv_init_data, dict):
-                                dyn_vars = conv_init_data.get('dynamic_variables', {})
-                                if isinstance(dyn_vars, dict):
-                                    conversation_id = dyn_vars.get('system__conversation_id')
-                                    if conversation_id:
-                                        logger.info(f"✅ Extracted conversation_id from data.data: {conversation_id}")
-                    
-                    # Try messages directly in data (structure 2)
-                    if not messages:
-                        if 'messages' in messages_data:
-                            messages = messages_data.get('messages', [])
-                            logger.info(f"✅ Found messages in data.messages: {len(messages)} messages")
-                        elif 'transcript' in messages_data:
-                            transcript_data = messages_data.get('transcript', [])
-                            if isinstance(transcript_data, list):
-                                messages = transcript_data
-                            elif isinstance(transcript_data, str):
-                                messages = [{'role': 'user', 'message': transcript_data}]
-                            logger.info(f"✅ Found transcript in data.transcript: {len(messages)} items")
-                        
-                        # Also extract conversation_id from this structure
-                        if not conversation_id:
-                            conv_init_data = messages_data.get('conversation_initiation_client_data', {})
-                            if isinstance(conv_init_data, dict):
-                                dyn_vars = conv_init_data.get('dynamic_variables', {})
-                                if isinstance(dyn_vars, dict):
-                                    conversation_id = dyn_vars.get('system__conversation_id')
-                                    if conversation_id:
-                                        logger.info(f"✅ Extracted conversation_id from data: {conversation_id}")
-                
-                # Fallback: try root level
-                if not messages:
-                    if 'messages' in data:
-                        messages = data.get('messages', [])
-                        logger.info(f"✅ Found messages in root: {len(messages)} messages")
-                    elif 'transcript' in data:
-                        transcript_data = data.get('transcript', [])
-                        if isinstance(transcript_data, list):
-                            messages = transcript_data
-                        elif isinstance(transcript_data, str):
-                            messages = [{'role': 'user', 'message': transcript_data}]
-                        logger.info(f"✅ Found transcript in root: {len(messages)} items")
-                    elif 'transcription' in data:
-                        transcription_data = data.get('transcription', '')
-                        if isinstance(transcription_data, str) and transcription_data:
-                            messages = [{'role': 'user', 'message': transcription_data}]
-                            logger.info(f"✅ Found transcription in root: {len(transcription_data)} chars")
-                
-                # If still no messages, log the structure for debugging
-                if not messages:
-                    logger.warning(f"⚠️ No messages found in webhook. Checking structure...")
-                    logger.info(f"Webhook data keys: {list(data.keys())}")
-                    if isinstance(messages_data, dict):
-                        logger.info(f"data keys: {list(messages_data.keys())}")
-                        inner_data = messages_data.get('data', {})
-                        if isinstance(inner_data, dict):
-                            logger.info(f"data.data keys: {list(inner_data.keys())}")
-                            # Log all keys that might contain transcript data
-                            for key in inner_data.keys():
-                                value = inner_data.get(key)
-                                if isinstance(value, (list, str)) and key not in ['conversation_initiation_client_data']:
-                                    logger.info(f"Found potential transcript field '{key}': type={type(value).__name__}, length={len(value) if hasattr(value, '__len__') else 'N/A'}")
+                        logger.debug(f"data.data keys: {list(inner_data.keys())}")
+                        # Log all keys that might contain transcript data
+                        for key, value in inner_data.items():
+                            if isinstance(value, (list, str)) and key != 'conversation_initiation_client_data':
+                                logger.debug(f"Found potential transcript field '{key}': type={type(value).__name__}, length={len(value)}")
+        
+        # Update call_id lookup if we found conversation_id
+        if conversation_id and not call_id:
+            call_id = self._lookup_call_id(conversation_id)
+            if call_id:
+                logger.info(f"✅ Found call_id {call_id} from conversation_id {conversation_id} via reverse mapping")
+        
+        logger.info(f"Processing {len(messages)} messages for event={event_type}, call_id={call_id}, conversation_id={conversation_id}")
+        
+        # If no messages found but we have conversation_id, try to fetch transcript from API
+        # The fetch (and the saves that follow it) run in the background so the webhook is answered right away
+        if not messages and conversation_id and event_type == 'post_call_transcription':
+            logger.info(f"⚠️ No messages in webhook, fetching transcript from ElevenLabs API in the background for conversation_id={conversation_id}")
+            pending = _HTTP_POOL.submit(self._process_fetched_transcript, data, metadata, event_type, conversation_id, call_id, db_call_id)
+            return conversation_id, pending
+        
+        # The saves run on the DB worker, queued behind the call's question inserts
+        pending = _submit_db(self._process_transcription, messages, data, metadata, event_type, conversation_id, call_id, db_call_id)
+        if pending is None:
+            raise Exception(f"DB write queue full - transcript not saved for conversation_id={conversation_id}")
+        return conversation_id, pending
+    
+    def _process_fetched_transcript(self, data, metadata, event_type, conversation_id, call_id, db_call_id):
+        """
+        Fetch a post-call transcript missing from its webhook, then process it on _DB_EXECUTOR (runs on _HTTP_POOL)
+        Waits for the processing, so this call's Future reports whether the whole job succeeded
+        """
+        messages = self._fetch_transcript_messages(conversation_id)
+        if not messages:
+            raise Exception(f"Transcript not available from ElevenLabs API for conversation_id={conversation_id}")
+        processed = _submit_db(self._process_transcription, messages, data, metadata, event_type,
+                               conversation_id, call_id, db_call_id)
+        if processed is None:
+            raise Exception(f"DB write queue full - transcript not saved for conversation_id={conversation_id}")
+        return processed.result()
+    
+    def _fetch_transcript_messages(self, conversation_id):
+        """
+        Messages of a conversation's transcript ([] if it can't be fetched), reused for TRANSCRIPT_CACHE_TTL;
+        concurrent calls for the same conversation share one API request
+        """
+        with self._cache_lock:
+            entry = self._transcript_locks.get(conversation_id)
+            if entry is None:
+                entry = self._transcript_locks[conversation_id] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                cached = self._transcripts.get(conversation_id)
+                if cached and time.monotonic() - cached[1] < TRANSCRIPT_CACHE_TTL:
+                    logger.info(f"Using cached transcript for conversation_id={conversation_id}: {len(cached[0])} messages")
+                    return cached[0]
                 
-                # Update call_id lookup if we found conversation_id
-                if conversation_id and not call_id:
-                    reverse_key = f'conv_{conversation_id}_call_id'
-                    if reverse_key in self.questions_cache:
-                        call_id = self.questions_cache[reverse_key]
-                        logger.info(f"✅ Found call_id {call_id} from conversation_id {conversation_id} via reverse mapping")
-                    else:
-                        # Try searching cache
-                        for key, value in self.questions_cache.items():
-                            if isinstance(key, str) and key.endswith('_conversation_id') and value == conversation_id:
-                                call_id = key.replace('_conversation_id', '')
-                                logger.info(f"✅ Found call_id {call_id} from conversation_id {conversation_id} in cache")
-                                # Store reverse mapping
-                                self.questions_cache[reverse_key] = call_id
-                                break
+                messages = self._request_transcript_messages(conversation_id)
+                if messages:
+                    with self._cache_lock:
+                        self._transcripts[conversation_id] = (messages, time.monotonic())
+                        self._transcripts.move_to_end(conversation_id)
+                        while len(self._transcripts) > MAX_TRANSCRIPT_ENTRIES:
+                            self._transcripts.popitem(last=False)
+                return messages
+        finally:
+            # The last thread using the lock removes it, so later callers never get a second lock
+            # while this one is still held or waited on
+            with self._cache_lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._transcript_locks[conversation_id]
+    
+    def _request_transcript_messages(self, conversation_id):
+        """Messages of a conversation's transcript from the ElevenLabs API ([] if it can't be fetched)"""
+        messages = []
+        try:
+            # Fetch conversation transcript from ElevenLabs API
+            transcript_url = f'https://api.elevenlabs.io/v1/convai/conversation/{conversation_id}/transcript'
+            response = self.http.get(transcript_url, timeout=API_READ_TIMEOUT)
+            
+            if response.status_code == 200:
+                transcript_data = parse_json(response.content)
+                if logger.isEnabledFor(logging.INFO):
+                    # Compact JSON: the 500-char preview shows content rather than indentation
+                    logger.info("✅ Successfully fetched transcript from API: %s", _json_preview(transcript_data, 500))
                 
-                logger.info(f"Processing {len(messages)} messages for event={event_type}, call_id={call_id}, conversation_id={conversation_id}")
+                # Extract messages from API response
+                # The API might return messages in different formats
+                if isinstance(transcript_data, dict):
+                    messages = transcript_data.get('messages', transcript_data.get('transcript', []))
+                elif isinstance(transcript_data, list):
+                    messages = transcript_data
                 
-                # If no messages found but we have conversation_id, try to fetch transcript from API
-                if not messages and conversation_id and event_type == 'post_call_transcription':
-                    logger.info(f"⚠️ No messages in webhook, attempting to fetch transcript from ElevenLabs API for conversation_id={conversation_id}")
-                    try:
-                        # Fetch conversation transcript from ElevenLabs API
-                        transcript_url = f'https://api.elevenlabs.io/v1/convai/conversation/{conversation_id}/transcript'
-                        headers = {'xi-api-key': self.api_key}
-                        response = requests.get(transcript_url, headers=headers, timeout=10)
-                        
-                        if response.status_code == 200:
-                            transcript_data = response.json()
-                            logger.info(f"✅ Successfully fetched transcript from API: {json.dumps(transcript_data, indent=2)[:500]}")
-                            
-                            # Extract messages from API response
-                            # The API might return messages in different formats
-                            if isinstance(transcript_data, dict):
-                                messages = transcript_data.get('messages', transcript_data.get('transcript', []))
-                            elif isinstance(transcript_data, list):
-                                messages = transcript_data
-                            
-                            if messages:
-                                logger.info(f"✅ Extracted {len(messages)} messages from API response")
-                        else:
-                            logger.warning(f"Failed to fetch transcript from API: Status {response.status_code}, Response: {response.text[:200]}")
-                    except Exception as api_error:
-                        logger.warning(f"Error fetching transcript from API: {str(api_error)}")
+                if messages:
+                    logger.info(f"✅ Extracted {len(messages)} messages from API response")
+            else:
+                logger.warning(f"Failed to fetch transcript from API: Status {response.status_code}, Response: {response.content[:200].decode('utf-8', errors='replace')}")
+        except Exception as api_error:
+            logger.warning(f"Error fetching transcript from API: {str(api_error)}")
+        return messages
+    
+    def _process_transcription(self, messages, data, metadata, event_type, conversation_id, call_id, db_call_id):
+        """Build the transcript from messages and save its answers; returns conversation_id (runs on _DB_EXECUTOR)"""
+        # Build full transcript from messages; for post_call_transcription the same pass
+        # parses the messages to extract questions and answers
+        parse_qa = event_type == 'post_call_transcription'
+        full_transcript = []
+        append_line = full_transcript.append
+        question_num = 0
+        current_question = None
+        questions_and_answers = []
+        user_answers = set()
+        for msg in messages:
+            role, message_text = _extract_role_text(msg)
+            if not message_text:
+                continue
+            prefix = _ROLE_PREFIXES.get(role) or f"{(role or 'unknown').upper()}: "
+            append_line(f"{prefix}{message_text}")
+            if not parse_qa:
+                # Scan each user utterance on its own - agent lines in the joined transcript
+                # would push the user's answer out of the scan window
+                if role == 'user':
+                    user_answers.add(self._extract_answer(message_text))
+                continue
+            
+            # Extract questions and answers
+            # Filter out confirmation questions and greetings to get only actual survey questions
+            message_text = message_text.strip()
+            if role == 'agent' and message_text:
+                message_lower = message_text.lower()
+                # Skip confirmation questions and greetings
+                is_confirmation = any(phrase in message_lower for phrase in [
+                    'is that correct', 'you said', 'did i hear', 'confirm'
+                ])
+                is_greeting = any(phrase in message_lower for phrase in [
+                    'how can i help', 'calling for', 'may i proceed', 'can i help'
+                ])
                 
-                # Build full transcript from messages
-                full_transcript = []
-                for msg in messages:
-                    # Handle different message formats
+                # Check if this is an actual survey question (contains question mark or "yes or no")
+                if ('?' in message_text or 'yes or no' in message_lower) and not is_confirmation and not is_greeting:
+                    # Clean question text by removing instruction phrases
+                    cleaned_question = self._clean_question(message_text)
+                    current_question = cleaned_question
+                    question_num += 1
+                    logger.info(f"📝 Found actual survey question {question_num}: {current_question}")
+            elif role == 'user' and message_text and current_question:
+                # This is an answer to the current question
+                answer = self._extract_answer(message_text)
+                if answer:
+                    questions_and_answers.append({
+                        'question_number': question_num,
+                        'question': current_question,
+                        'answer': answer,
+                        'raw_answer': message_text
+                    })
+                    logger.info(f"✅ Extracted answer {question_num}: {answer} (raw: {message_text})")
+                    current_question = None
+        
+        text = "\n".join(full_transcript)
+        if text:
+            logger.info("Full transcript (%d chars): %s...", len(text), text[:500])
+        else:
+            logger.warning(f"No transcript text extracted from {len(messages)} messages")
+            # Log first few messages for debugging
+            if logger.isEnabledFor(logging.INFO):
+                for i, msg in enumerate(messages[:3]):
                     if isinstance(msg, dict):
-                        role = msg.get('role', msg.get('speaker', 'unknown'))
-                        message_text = msg.get('message', msg.get('text', msg.get('content', '')))
-                    elif isinstance(msg, str):
-                        # If message is just a string, treat it as user message
-                        role = 'user'
-                        message_text = msg
+                        logger.info("Message %d: %s", i, _json_preview(msg, 200))
                     else:
-                        continue
-                    
-                    if message_text:
-                        full_transcript.append(f"{role.upper()}: {message_text}")
-                
-                text = "\n".join(full_transcript)
-                if text:
-                    logger.info(f"Full transcript ({len(text)} chars): {text[:500]}...")
-                else:
-                    logger.warning(f"No transcript text extracted from {len(messages)} messages")
-                    # Log first few messages for debugging
-                    for i, msg in enumerate(messages[:3]):
-                        if isinstance(msg, dict):
-                            logger.info(f"Message {i}: {json.dumps(msg, default=str)[:200]}")
-                        else:
-                            logger.info(f"Message {i}: {str(msg)[:200]}")
-                
-                # For post_call_transcription, we get full conversation transcript with messages array
-                # Parse messages to extract Q&A pairs
-                if event_type == 'post_call_transcription':
-                    # Save full transcription to database (even if messages array is empty, we might have text)
-                    # Use db_call_id (integer) for database operations, not the string call_id
-                    if db_call_id and self.db_available and self.db:
-                        try:
-                            # Check if we have a call record (use db_call_id which is guaranteed to be integer)
-                            call_data = self.db.get_call_data(db_call_id)
-                            if call_data:
-                                if messages:
-                                    logger.info(f"Saving transcription for call_id={db_call_id} from {len(messages)} messages")
-                                    
-                                    # Parse messages to extract questions and answers
-                                    # Filter out confirmation questions and greetings to get only actual survey questions
-                                    question_num = 0
-                                    current_question = None
-                                    questions_and_answers = []
-                                    
-                                    for msg in messages:
-                                        # Handle different message formats
-                                        if isinstance(msg, dict):
-                                            role = msg.get('role', msg.get('speaker', ''))
-                                            message_text = msg.get('message', msg.get('text', msg.get('content', ''))).strip()
-                                        elif isinstance(msg, str):
-                                            role = 'user'
-                                            message_text = msg.strip()
-                                        else:
-                                            continue
-                                        
-                                        # Extract questions and answers
-                                        # Filter out confirmation questions and greetings to get only actual survey questions
-                                        if role == 'agent' and message_text:
-                                            message_lower = message_text.lower().strip()
-                                            # Skip confirmation questions and greetings
-                                            is_confirmation = any(phrase in message_lower for phrase in [
-                                                'is that correct', 'you said', 'did i hear', 'confirm'
-                                            ])
-                                            is_greeting = any(phrase in message_lower for phrase in [
-                                                'how can i help', 'calling for', 'may i proceed', 'can i help'
-                                            ])
-                                            
-                                            # Check if this is an actual survey question (contains question mark or "yes or no")
-                                            if ('?' in message_text or 'yes or no' in message_lower) and not is_confirmation and not is_greeting:
-                                                # Clean question text by removing instruction phrases
-                                                cleaned_question = self._clean_question(message_text)
-                                                current_question = cleaned_question
-                                                question_num += 1
-                                                logger.info(f"📝 Found actual survey question {question_num}: {current_question}")
-                                        elif role == 'user' and message_text and current_question:
-                                            # This is an answer to the current question
-                                            answer = self._extract_answer(message_text)
-                                            if answer:
-                                                questions_and_answers.append({
-                                                    'question_number': question_num,
-                                                    'question': current_question,
-                                                    'answer': answer,
-                                                    'raw_answer': message_text
-                                                })
-                                                logger.info(f"✅ Extracted answer {question_num}: {answer} (raw: {message_text})")
-                                                current_question = None
-                                    
-                                    # Save questions and answers to database
-                                    if questions_and_answers:
-                                        logger.info(f"Saving {len(questions_and_answers)} Q&A pairs to database for call_id={db_call_id}")
-                                        for qa in questions_and_answers:
-                                            try:
-                                                # Check if question already exists
-                                                existing_questions = self.db.get_call_questions(db_call_id)
-                                                existing_question = next(
-                                                    (q for q in existing_questions 
-                                                     if q.get('question_number') == qa['question_number']),
-                                                    None
-                                                )
-                                                
-                                                if not existing_question:
-                                                    # Insert new question
-                                                    self.db.save_question(
-                                                        call_id=db_call_id,
-                                                        question_text=qa['question'],
-                                                        question_number=qa['question_number']
-                                                    )
-                                                    logger.info(f"✅ Saved new question {qa['question_number']}: {qa['question']}")
-                                                else:
-                                                    # Update question text if it's different (e.g., cleaned version)
-                                                    if existing_question.get('question_text') != qa['question']:
-                                                        update_question_query = """
-                                                        UPDATE questions 
-                                                        SET question_text = ?
-                                                        WHERE call_id = ? AND question_number = ?
-                                                        """
-                                                        self.db.execute(update_question_query, (
-                                                            qa['question'],
-                                                            db_call_id,
-                                                            qa['question_number']
-                                                        ))
-                                                        logger.info(f"✅ Updated question text {qa['question_number']}: {qa['question']}")
-                                                
-                                                # Update answer (this will update existing question)
-                                                self.db.save_answer(
-                                                    call_id=db_call_id,
-                                                    question_num=qa['question_number'],
-                                                    answer=qa['answer'],
-                                                    confidence=0.9,
-                                                    raw_response=qa['raw_answer']
-                                                )
-                                                logger.info(f"✅ Saved answer {qa['question_number']}: {qa['answer']}")
-                                            except Exception as save_error:
-                                                logger.error(f"Could not save Q&A {qa['question_number']}: {str(save_error)}", exc_info=True)
-                                    
-                                    # Update calls table with completed status, ended_at, and duration
-                                    try:
-                                        # Use SQL Server's GETDATE() and DATEDIFF for consistency
-                                        update_query = """
-                                        UPDATE calls 
-                                        SET status = 'completed', 
-                                            ended_at = GETDATE(),
-                                            duration_seconds = CASE 
-                                                WHEN started_at IS NOT NULL 
-                                                THEN DATEDIFF(SECOND, started_at, GETDATE())
-                                                ELSE 0
-                                            END
-                                        WHERE id = ?
-                                        """
-                                        self.db.execute(update_query, (db_call_id,))
-                                        logger.info(f"✅ Updated call {db_call_id}: status=completed, ended_at=GETDATE(), duration calculated")
-                                    except Exception as update_error:
-                                        logger.error(f"Could not update call status: {str(update_error)}", exc_info=True)
-                                    
-                                    # Generate and save call_results
+                        logger.info("Message %d: %s", i, str(msg)[:200])
+        
+        # For post_call_transcription, we get full conversation transcript with messages array
+        # Parse messages to extract Q&A pairs
+        if event_type == 'post_call_transcription':
+            # Save full transcription to database (even if messages array is empty, we might have text)
+            # Use db_call_id (integer) for database operations, not the string call_id
+            if db_call_id and self.db_available and self.db:
+                try:
+                    # Check if we have a call record (use db_call_id which is guaranteed to be integer)
+                    call_data = self.db.get_call_data(db_call_id)
+                    if call_data:
+                        if messages:
+                            logger.info(f"Saving transcription for call_id={db_call_id} from {len(messages)} messages")
+                            
+                            # Save questions and answers to database
+                            if questions_and_answers:
+                                logger.info(f"Saving {len(questions_and_answers)} Q&A pairs to database for call_id={db_call_id}")
+                                # Questions already stored for the call (from initiate_call), read once for all pairs
+                                try:
+                                    existing_by_number = {q.get('question_number'): q for q in self.db.get_call_questions(db_call_id)}
+                                except Exception as fetch_error:
+                                    logger.warning(f"Could not load existing questions for call_id={db_call_id}: {str(fetch_error)}")
+                                    existing_by_number = {}
+                                # Answers are written together after the questions exist
+                                pending_answers = []
+                                for qa in questions_and_answers:
                                     try:
-                                        call_results = self.db.get_call_results_json(db_call_id)
-                                        if call_results:
-                                            logger.info(f"✅ Generated and saved call results for call_id={db_call_id}")
+                                        # Check if question already exists
+                                        existing_question = existing_by_number.get(qa['question_number'])
+                                        
+                                        if not existing_question:
+                                            # Insert new question
+                                            self.db.save_question(
+                                                call_id=db_call_id,
+                                                question_text=qa['question'],
+                                                question_number=qa['question_number']
+                                            )
+                                            logger.info(f"✅ Saved new question {qa['question_number']}: {qa['question']}")
                                         else:
-                                            logger.warning(f"Could not generate call results for call_id={db_call_id}")
-                                    except Exception as results_error:
-                                        logger.error(f"Could not generate call results: {str(results_error)}", exc_info=True)
-                                    
-                                    # Also save the full transcript as a complete record
-                                    if text:
-                                        logger.info(f"Full transcript available ({len(text)} chars) for call_id={db_call_id}")
-                                elif text:
-                                    # We have text but no messages array - save it anyway
-                                    logger.info(f"Saving transcription text ({len(text)} chars) for call_id={db_call_id} (no messages array)")
-                                    try:
-                                        # Update call status even if we only have text
-                                        update_query = """
-                                        UPDATE calls 
-                                        SET status = 'completed', 
-                                            ended_at = GETDATE(),
-                                            duration_seconds = DATEDIFF(SECOND, started_at, GETDATE())
-                                        WHERE id = ?
-                                        """
-                                        self.db.execute(update_query, (db_call_id,))
-                                        logger.info(f"✅ Updated call {db_call_id}: status=completed")
+                                            # Update question text if it's different (e.g., cleaned version)
+                                            if existing_question.get('question_text') != qa['question']:
+                                                update_question_query = """
+                                                UPDATE questions 
+                                                SET question_text = ?
+                                                WHERE call_id = ? AND question_number = ?
+                                                """
+                                                self.db.execute(update_question_query, (
+                                                    qa['question'],
+                                                    db_call_id,
+                                                    qa['question_number']
+                                                ))
+                                                logger.info(f"✅ Updated question text {qa['question_number']}: {qa['question']}")
+                                        
+                                        # Update answer (this will update existing question)
+                                        pending_answers.append((qa['question_number'], qa['answer'], 0.9, qa['raw_answer']))
                                     except Exception as save_error:
-                                        logger.error(f"Could not save transcript text: {str(save_error)}", exc_info=True)
+                                        logger.warning(f"Could not save Q&A {qa['question_number']}: {str(save_error)}")
+                                
+                                try:
+                                    self.db.save_answers_bulk(db_call_id, pending_answers)
+                                    logger.info(f"✅ Saved {len(pending_answers)} answers for call_id={db_call_id}")
+                                except Exception as save_error:
+                                    logger.warning(f"Could not save answers for call_id={db_call_id}: {str(save_error)}")
+                            
+                            # Update calls table with completed status, ended_at, and duration
+                            try:
+                                # Use SQL Server's GETDATE() and DATEDIFF for consistency
+                                update_query = """
+                                UPDATE calls 
+                                SET status = 'completed', 
+                                    ended_at = GETDATE(),
+                                    duration_seconds = CASE 
+                                        WHEN started_at IS NOT NULL 
+                                        THEN DATEDIFF(SECOND, started_at, GETDATE())
+                                        ELSE 0
+                                    END
+                                WHERE id = ?
+                                """
+                                self.db.execute(update_query, (db_call_id,))
+                                logger.info(f"✅ Updated call {db_call_id}: status=completed, ended_at=GETDATE(), duration calculated")
+                            except Exception as update_error:
+                                logger.warning(f"Could not update call status: {str(update_error)}")
+                            
+                            # Generate and save call_results
+                            try:
+                                call_results = self.db.get_call_results_json(db_call_id)
+                                if call_results:
+                                    logger.info(f"✅ Generated and saved call results for call_id={db_call_id}")
                                 else:
-                                    logger.warning(f"No messages or text to save for call_id={db_call_id}")
-                            else:
-                                logger.warning(f"Call record not found for call_id={db_call_id}, cannot save transcription. conversation_id={conversation_id}")
-                        except Exception as db_error:
-                            logger.error(f"Error saving transcription to database: {str(db_error)}", exc_info=True)
-                    elif conversation_id:
-                        # We have conversation_id but no valid database call_id
-                        logger.warning(f"Cannot save transcription: no valid database call_id found. conversation_id={conversation_id}. The call may not have been initiated through our system.")
-                else:
-                    # Regular transcription event - extract single answer
-                    answer = self._extract_answer(text)
-                    
-                    if db_call_id and text:
-                        question_num = (
-                            metadata.get('question_num', 0) or 
-                            metadata.get('questionNum', 0) or 
-                            data.get('question_num', 0) or
-                            data.get('question_index', 0)
-                        )
-                        if self.db_available and self.db:
+                                    logger.warning(f"Could not generate call results for call_id={db_call_id}")
+                            except Exception as results_error:
+                                logger.warning(f"Could not generate call results: {str(results_error)}")
+                            
+                            # Also save the full transcript as a complete record
+                            if text:
+                                logger.info(f"Full transcript available ({len(text)} chars) for call_id={db_call_id}")
+                        elif text:
+                            # We have text but no messages array - save it anyway
+                            logger.info(f"Saving transcription text ({len(text)} chars) for call_id={db_call_id} (no messages array)")
                             try:
-                                self.db.save_answer(
-                                    call_id=db_call_id,
-                                    question_num=question_num,
-                                    answer=answer or 'unclear',
-                                    confidence=0.8,
-                                    raw_response=text
-                                )
-                                logger.info(f"Saved transcription answer: question={question_num}, answer={answer}, call_id={db_call_id}")
-                            except Exception as db_error:
-                                logger.warning(f"Could not save answer: {str(db_error)}")
+                                # Update call status even if we only have text
+                                update_query = """
+                                UPDATE calls 
+                                SET status = 'completed', 
+                                    ended_at = GETDATE(),
+                                    duration_seconds = DATEDIFF(SECOND, started_at, GETDATE())
+                                WHERE id = ?
+                                """
+                                self.db.execute(update_query, (db_call_id,))
+                                logger.info(f"✅ Updated call {db_call_id}: status=completed")
+                            except Exception as save_error:
+                                logger.warning(f"Could not save transcript text: {str(save_error)}")
+                        else:
+                            logger.warning(f"No messages or text to save for call_id={db_call_id}")
                     else:
-                        logger.warning(f"Cannot save transcription: db_call_id={db_call_id}, text_length={len(text) if text else 0}, conversation_id={conversation_id}")
-            
-            # Mark webhook log as successfully processed
-            if log_id and self.db_available and self.db:
-                try:
-                    # Use string version of call_id or conversation_id for logging
-                    log_call_id = str(db_call_id) if db_call_id else (conversation_id if conversation_id else None)
-                    update_query = """
-                    UPDATE webhook_logs 
-                    SET processed_successfully = 1, call_id = ?
-                    WHERE id = ?
-                    """
-                    self.db.execute(update_query, (log_call_id, log_id))
-                    logger.info(f"✅ Updated webhook log {log_id} as successfully processed")
-                except Exception as update_error:
-                    logger.warning(f"Could not update webhook log status: {str(update_error)}")
-            
-            return {'status': 'ok', 'log_id': log_id}
-            
-        except Exception as e:
-            error_message = str(e)
-            logger.error(f"Error handling ElevenLabs webhook: {error_message}", exc_info=True)
-            
-            # Update webhook log with error message
-            if log_id and self.db_available and self.db:
-                try:
-                    # Use string version of call_id or conversation_id for logging
-                    log_call_id = str(db_call_id) if db_call_id else (conversation_id if conversation_id else None)
-                    update_query = """
-                    UPDATE webhook_logs 
-                    SET processed_successfully = 0, error_message = ?, call_id = ?
-                    WHERE id = ?
-                    """
-                    self.db.execute(update_query, (error_message[:4000], log_call_id, log_id))  # Limit error message length
-                except Exception as update_error:
-                    logger.warning(f"Could not update webhook log with error: {str(update_error)}")
+                        logger.warning(f"Call record not found for call_id={db_call_id}, cannot save transcription. conversation_id={conversation_id}")
+                except Exception as db_error:
+                    logger.warning(f"Error saving transcription to database: {str(db_error)}")
+            elif conversation_id:
+                # We have conversation_id but no valid database call_id
+                logger.warning(f"Cannot save transcription: no valid database call_id found. conversation_id={conversation_id}. The call may not have been initiated through our system.")
+        else:
+            # Regular transcription event - extract single answer from the user's utterances
+            if 'yes' in user_answers:
+                answer = 'yes'
+            elif 'no' in user_answers:
+                answer = 'no'
             else:
-                # If we didn't save the log earlier, try to save it now with error
-                if self.db_available and self.db:
-                    try:
-                        # Try to extract basic info from original data
-                        original_data = original_webhook_data if isinstance(original_webhook_data, dict) else {}
-                        event_type = original_data.get('event_type') or original_data.get('eventType') or 'unknown'
-                        # Use string version for logging
-                        log_call_id = str(db_call_id) if db_call_id else (conversation_id if conversation_id else None)
-                        self.db.save_webhook_log(
-                            event_type=event_type,
-                            conversation_id=conversation_id,
-                            call_id=log_call_id,
-                            call_sid=call_sid,
-                            webhook_data=original_data,
-                            processed_successfully=False,
-                            error_message=error_message[:4000]
-                        )
-                    except Exception as save_error:
-                        logger.warning(f"Could not save webhook log with error: {str(save_error)}")
+                answer = 'unclear' if text else None
             
-            return {'status': 'error', 'message': error_message, 'log_id': log_id}
+            if db_call_id and text:
+                question_num = _first_in((metadata, data), _QUESTION_NUM_KEYS) or 0
+                if self.db_available and self.db:
+                    self._save_answer(db_call_id, question_num, answer, text)
+            else:
+                logger.warning(f"Cannot save transcription: db_call_id={db_call_id}, text_length={len(text) if text else 0}, conversation_id={conversation_id}")
+        
+        return conversation_id
+    
+    def _save_questions(self, call_id, questions):
+        """Persist the call's questions (runs on _DB_EXECUTOR)"""
+        try:
+            self.db.save_questions_bulk(call_id, questions)
+        except Exception as db_error:
+            logger.warning(f"Database not available, using cache: {str(db_error)}")
+    
+    def _save_answer(self, db_call_id, question_num, answer, text):
+        """Persist a single transcribed answer (runs on _DB_EXECUTOR)"""
+        try:
+            self.db.save_answer(
+                call_id=db_call_id,
+                question_num=question_num,
+                answer=answer or 'unclear',
+                confidence=0.8,
+                raw_response=text
+            )
+            logger.info(f"Saved transcription answer: question={question_num}, answer={answer}, call_id={db_call_id}")
+        except Exception as db_error:
+            logger.warning(f"Could not save answer: {str(db_error)}")
     
     def _extract_answer(self, text):
         """Extract yes/no answer from transcription text"""
-        if not text:
+        if not text or text.isspace():
             return None
         
-        text_lower = text.lower().strip()
-        
-        yes_keywords = ['yes', 'yeah', 'yep', 'correct', 'right', 'sure', 'okay', 'ok', 'yup', 'affirmative']
-        no_keywords = ['no', 'nope', 'nah', 'incorrect', 'wrong', 'negative']
+        # Yes/no answers lead the utterance - only scan its opening window
+        window = text[:ANSWER_SCAN_CHARS]
         
-        if any(word in text_lower for word in yes_keywords):
+        if YES_RE.search(window):
             return 'yes'
-        elif any(word in text_lower for word in no_keywords):
+        elif NO_RE.search(window):
             return 'no'
         else:
             return 'unclear'
@@ -1059,12 +1499,8 @@ REMEMBER: Access conversation_initiation_client_data.dynamic_variables IMMEDIATE
                     voice_id = "21m00Tcm4TlvDq8ikWAM"  # Default voice fallback
         
             # Create agent via API
-            agent_response = requests.post(
+            agent_response = self.http.post(
                 'https://api.elevenlabs.io/v1/convai/agents',
-                headers={
-                    'xi-api-key': self.api_key,
-                    'Content-Type': 'application/json'
-                },
                 json={
                     'name': name,
                     'description': description,
@@ -1077,7 +1513,7 @@ REMEMBER: Access conversation_initiation_client_data.dynamic_variables IMMEDIATE
                         'max_turns': 15  # Allow enough turns for questions
                     }
                 },
-                timeout=15
+                timeout=API_WRITE_TIMEOUT
             )
         
             if agent_response.status_code in [200, 201]:
@@ -1108,12 +1544,8 @@ REMEMBER: Access conversation_initiation_client_data.dynamic_variables IMMEDIATE
             raise Exception("ElevenLabs API key not configured.")
     
         try:
-            privacy_response = requests.patch(
+            privacy_response = self.http.patch(
                 f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}',
-                headers={
-                    'xi-api-key': self.api_key,
-                    'Content-Type': 'application/json'
-                },
                 json={
                     'privacy_settings': {
                         'audio_retention': 'disabled',
@@ -1121,7 +1553,7 @@ REMEMBER: Access conversation_initiation_client_data.dynamic_variables IMMEDIATE
                         'data_persistence': False
                     }
                 },
-                timeout=15
+                timeout=API_WRITE_TIMEOUT
             )
     
             if privacy_response.status_code in [200, 201, 204]:
@@ -1227,28 +1659,20 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
             
             # Try nested structure first (conversation_config.agent.system_prompt) - this is where it's stored
             logger.info(f"Attempting to update system prompt in conversation_config.agent...")
-            update_response = requests.patch(
+            update_response = self.http.patch(
                 f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}',
-                headers={
-                    'xi-api-key': self.api_key,
-                    'Content-Type': 'application/json'
-                },
                 json=update_payload_nested,
-                timeout=15
+                timeout=API_WRITE_TIMEOUT
             )
             
             # If nested structure update fails, try root level (for backward compatibility)
             if update_response.status_code not in [200, 201, 204]:
                 logger.info(f"Nested structure update failed ({update_response.status_code}), trying root level...")
                 logger.info(f"Error response: {update_response.text[:500]}")
-                update_response = requests.patch(
+                update_response = self.http.patch(
                     f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}',
-                    headers={
-                        'xi-api-key': self.api_key,
-                        'Content-Type': 'application/json'
-                    },
                     json=update_payload_root,
-                    timeout=15
+                    timeout=API_WRITE_TIMEOUT
                 )
             
             if update_response.status_code in [200, 201, 204]:
@@ -1256,13 +1680,11 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                 # Verify the update by fetching agent details
                 try:
                     # Wait a moment for the update to propagate
-                    import time
                     time.sleep(1)
                     
-                    verify_response = requests.get(
+                    verify_response = self.http.get(
                         f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}',
-                        headers={'xi-api-key': self.api_key},
-                        timeout=10
+                        timeout=API_READ_TIMEOUT
                     )
                     if verify_response.status_code == 200:
                         agent_data = verify_response.json()
@@ -1365,10 +1787,9 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                 return None
                 
             logger.info(f"Fetching agent details for {agent_id}")
-            response = requests.get(
+            response = self.http.get(
                 f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}',
-                headers={'xi-api-key': self.api_key},
-                timeout=10
+                timeout=API_READ_TIMEOUT
             )
             logger.info(f"API response status: {response.status_code}")
             
@@ -1463,7 +1884,8 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                         logger.info(f"workflow preview: {str(workflow)[:500]}")
                     
                     # Log the full structure for debugging (truncated)
-                    logger.debug(f"Agent data structure: {json.dumps(agent_data, indent=2, default=str)[:2000]}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Agent data structure: {_json_preview(agent_data, 2000, indent=True)}")
                 
                 # Check for override settings (if available in response)
                 override_settings = agent_data.get('override_settings', {}) or agent_data.get('overrideSettings', {})
@@ -1502,9 +1924,9 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                     'response_text': error_msg
                 }
             else:
-                error_msg = response.text[:500] if response.text else "Unknown error"
+                error_msg = response.content[:500].decode('utf-8', errors='replace') or "Unknown error"
                 logger.error(f"❌ Could not get agent details: {response.status_code} - {error_msg}")
-                logger.error(f"Response headers: {dict(response.headers)}")
+                logger.error(f"Response headers: {response.headers}")
                 # Return error info instead of None so we can see what went wrong
                 return {
                     'error': True,
@@ -1541,13 +1963,9 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
         
         try:
             # Get all tools for the agent
-            tools_response = requests.get(
+            tools_response = self.http.get(
                 f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}/tools',
-                headers={
-                    'xi-api-key': self.api_key,
-                    'Content-Type': 'application/json'
-                },
-                timeout=10
+                timeout=API_READ_TIMEOUT
             )
             
             if tools_response.status_code == 200:
@@ -1557,12 +1975,9 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                     if tool.get('name') == 'submit_form':
                         tool_id = tool.get('tool_id')
                         if tool_id:
-                            delete_response = requests.delete(
+                            delete_response = self.http.delete(
                                 f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}/tools/{tool_id}',
-                                headers={
-                                    'xi-api-key': self.api_key
-                                },
-                                timeout=10
+                                timeout=API_WRITE_TIMEOUT
                             )
                             if delete_response.status_code in [200, 204]:
                                 logger.info(f"✅ Deleted existing submit_form tool (ID: {tool_id})")
@@ -1622,12 +2037,8 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                 }
             }]
     
-            tool_response = requests.post(
+            tool_response = self.http.post(
                 f'https://api.elevenlabs.io/v1/convai/agents/{agent_id}/tools',
-                headers={
-                    'xi-api-key': self.api_key,
-                    'Content-Type': 'application/json'
-                },
                 json={
                     'name': 'submit_form',
                     'description': 'Submit the filled form JSON to the webhook endpoint when ALL questions are answered. Send a single parameter named "answers" which is an array of objects, one per question, each containing at least the question_text and the chosen answer.',
@@ -1640,7 +2051,7 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                         'token': self.webhook_secret or 'default_token'
                     }
                 },
-                timeout=15
+                timeout=API_WRITE_TIMEOUT
             )
     
             if tool_response.status_code in [200, 201]:
@@ -1678,7 +2089,6 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
         
             # Format questions for agent
             questions_list = [{"text": q} for q in LIST_OF_QUESTIONS]
-            questions_text = "\n".join([f"Question {i+1}: {q}" for i, q in enumerate(LIST_OF_QUESTIONS)])
         
             questions_json = questions_list
         
@@ -1719,14 +2129,14 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
                 call_id = int(short_uuid, 16) % 1000000
         
             # Store session info with questions
-            self.questions_cache[session_id] = {
+            self._cache_set(session_id, {
                 'call_id': call_id,
                 'questions': LIST_OF_QUESTIONS,
                 'questions_list': questions_list,
                 'user_id': user_id,
                 'form_data': {},
                 'current_question': 0
-            }
+            })
         
             logger.info(f"Agent session started: session_id={session_id}, call_id={call_id}")
             
@@ -1807,21 +2217,17 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
             # Find session by conversation_id
             session_id = None
             if conversation_id:
-                # Search cache for conversation_id
-                for key, value in self.questions_cache.items():
-                    if isinstance(key, str) and key.endswith('_conversation_id') and value == conversation_id:
-                        session_id = key.replace('_conversation_id', '')
-                        break
+                session_id = self._lookup_call_id(conversation_id)
         
             # If not found by conversation_id, try to find by cached sessions
             if not session_id:
-                for key, session in self.questions_cache.items():
+                for key, session in self._cache_items():
                     if isinstance(session, dict) and session.get('call_id'):
                         session_id = key
                         break
         
-            if session_id and session_id in self.questions_cache:
-                session = self.questions_cache[session_id]
+            session = self._cache_get(session_id) if session_id else None
+            if session is not None:
                 call_id = session.get('call_id')
 
                 # Decide which payload format we received and normalise into a list
@@ -1866,6 +2272,10 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
 
                 if self.db_available and self.db and call_id and normalized_answers:
                     try:
+                        # Let initiate_call's background question insert land before checking for rows
+                        questions_saved = session.get('questions_saved')
+                        if questions_saved is not None:
+                            questions_saved.result()  # _save_questions logs and swallows its own errors
                         existing_questions = self.db.get_call_questions(call_id)
 
                         # Save / update each question and answer
@@ -1928,22 +2338,31 @@ REMEMBER: You ONLY ask these 5 questions. Do NOT make up questions. Do NOT use t
             'message': f'Unknown tool: {tool_name}'
         }
     
-    def validate_webhook_signature(self, timestamp, body, signature):
+    def validate_webhook_signature(self, raw_body, signature_header):
         """
         Validate ElevenLabs webhook signature for security
+        Checks an 'ElevenLabs-Signature: t=<timestamp>,v0=<hmac>' header against the raw request body;
+        runs before the body is parsed, so unsigned or forged requests are dropped cheaply
         """
         if not self.webhook_secret:
             logger.warning("Webhook secret not configured - skipping signature validation")
             return True
-    
+        
+        if not signature_header:
+            return False
+        
         try:
-            expected = f"t={timestamp},v0={hmac.new(
+            parts = dict(part.split('=', 1) for part in signature_header.split(',') if '=' in part)
+            timestamp = parts.get('t', '')
+            if abs(time.time() - int(timestamp)) > WEBHOOK_SIGNATURE_TOLERANCE:
+                return False
+            
+            expected = hmac.new(
                 self.webhook_secret.encode(),
-                f"{timestamp}.{body}".encode(),
+                timestamp.encode() + b'.' + raw_body,
                 hashlib.sha256
-            ).hexdigest()}"
-    
-            return hmac.compare_digest(signature, expected)
+            ).hexdigest()
+            return hmac.compare_digest(parts.get('v0', ''), expected)
         except Exception as e:
-            logger.error(f"Error validating signature: {str(e)}")
+            logger.warning(f"Could not verify webhook signature: {str(e)}")
             return False
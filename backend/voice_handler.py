@@ -3,15 +3,50 @@ Voice call handler using Twilio
 Manages voice call flow and question-answer collection
 """
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 from twilio.twiml.voice_response import VoiceResponse, Gather
 from config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER, WEBHOOK_BASE_URL
 from database import Database
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
+import re
+import threading
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Process-wide Twilio REST client - every handler shares one pooled HTTP session
+_twilio_client = None
+_twilio_client_lock = threading.Lock()
+
+# Background writes that the call flow doesn't need to wait for (one worker, so writes stay in order;
+# it uses its own per-thread Database connection)
+_DB_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='voice-db')
+
+# Upper bound on questions_cache entries - calls that never reach the final question age out
+MAX_CACHED_CALLS = 4096
+
+# Yes/no keyword matchers for spoken answers (whole words only, so "know" is not "no");
+# also used by the ElevenLabs handler
+YES_RE = re.compile(r'\b(?:yes|yeah|yep|correct|right|sure|okay|ok|yup|affirmative)\b', re.IGNORECASE)
+NO_RE = re.compile(r'\b(?:no|nope|nah|incorrect|wrong|negative)\b', re.IGNORECASE)
+
+
+def get_twilio_client():
+    """Return the shared Twilio client, creating it on first use (None if credentials are not configured)"""
+    global _twilio_client
+    if _twilio_client is None and TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
+        with _twilio_client_lock:
+            if _twilio_client is None:
+                _twilio_client = Client(
+                    TWILIO_ACCOUNT_SID,
+                    TWILIO_AUTH_TOKEN,
+                    http_client=TwilioHttpClient(pool_connections=True)
+                )
+    return _twilio_client
+
 
 class VoiceHandler:
     def __init__(self):
@@ -20,8 +55,17 @@ class VoiceHandler:
         self.phone_number = TWILIO_PHONE_NUMBER
         self.webhook_url = WEBHOOK_BASE_URL
         
+        # Twilio callback URLs (fixed per process; only the query string varies per call)
+        self.voice_flow_url = f'{self.webhook_url}/api/voice-flow'
+        self.process_answer_url = f'{self.webhook_url}/api/process-answer'
+        self.status_callback_url = f'{self.webhook_url}/api/call-status'
+        
         # In-memory cache for questions (used when database is unavailable)
-        self.questions_cache = {}
+        # Oldest-first, bounded to MAX_CACHED_CALLS entries (see _cache_questions)
+        self.questions_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Question inserts still running on _DB_EXECUTOR, keyed by str(call_id) (see _wait_for_questions)
+        self._pending_question_saves = {}
         
         # Initialize database (optional - continue if fails)
         try:
@@ -33,7 +77,7 @@ class VoiceHandler:
             self.db_available = False
         
         if self.account_sid and self.auth_token:
-            self.client = Client(self.account_sid, self.auth_token)
+            self.client = get_twilio_client()
         else:
             logger.warning("Twilio credentials not configured")
             self.client = None
@@ -45,32 +89,26 @@ class VoiceHandler:
         
         try:
             # Store questions in cache (for use when database unavailable)
-            # Store with multiple key formats to ensure retrieval works
+            # Always keyed by the string call_id - lookups normalize the same way
             call_id_str = str(call_id)
-            self.questions_cache[call_id_str] = questions
-            # Also store with int key if it's numeric
-            if call_id_str.isdigit():
-                self.questions_cache[int(call_id_str)] = questions
-            # Also store with original call_id if different
-            if call_id != call_id_str and call_id not in self.questions_cache:
-                self.questions_cache[call_id] = questions
-            logger.info(f"Questions cached for call_id {call_id_str} (also as {int(call_id_str) if call_id_str.isdigit() else 'N/A'}): {len(questions)} questions: {[q.get('text', '')[:50] for q in questions]}")
+            self._cache_questions(call_id_str, questions)
+            logger.info(f"Questions cached for call_id {call_id_str}: {len(questions)} questions: {[q.get('text', '')[:50] for q in questions]}")
             
-            # Try to store questions in database (optional - continue if fails)
+            # Store questions in database in the background (optional) - the voice flow reads
+            # them from the cache, so the Twilio call doesn't need to wait on the inserts
             if self.db_available and self.db:
-                try:
-                    for idx, question in enumerate(questions):
-                        self.db.save_question(call_id, question.get('text', ''), idx)
-                except Exception as db_error:
-                    logger.warning(f"Database not available, using cache: {str(db_error)}")
+                save_future = _DB_EXECUTOR.submit(self._save_questions, call_id, questions)
+                with self._cache_lock:
+                    self._pending_question_saves[call_id_str] = save_future
+                save_future.add_done_callback(lambda _: self._forget_question_save(call_id_str, save_future))
             
             # Initiate the call
             call = self.client.calls.create(
                 to=to_number,
                 from_=self.phone_number,
-                url=f'{self.webhook_url}/api/voice-flow?call_id={call_id}',
+                url=f'{self.voice_flow_url}?call_id={call_id}',
                 method='POST',
-                status_callback=f'{self.webhook_url}/api/call-status',
+                status_callback=self.status_callback_url,
                 status_callback_method='POST'
             )
             
@@ -80,6 +118,33 @@ class VoiceHandler:
             logger.error(f"Error initiating call: {str(e)}")
             raise
     
+    def _cache_questions(self, call_id_str, questions):
+        """Cache a call's questions, evicting the oldest calls beyond MAX_CACHED_CALLS"""
+        with self._cache_lock:
+            self.questions_cache[call_id_str] = questions
+            while len(self.questions_cache) > MAX_CACHED_CALLS:
+                self.questions_cache.popitem(last=False)
+    
+    def _save_questions(self, call_id, questions):
+        """Persist the call's questions (runs on _DB_EXECUTOR)"""
+        try:
+            self.db.save_questions_bulk(call_id, questions)
+        except Exception as db_error:
+            logger.warning(f"Database not available, using cache: {str(db_error)}")
+    
+    def _forget_question_save(self, call_id_str, save_future):
+        """Drop a finished question insert from _pending_question_saves (unless a newer one replaced it)"""
+        with self._cache_lock:
+            if self._pending_question_saves.get(call_id_str) is save_future:
+                del self._pending_question_saves[call_id_str]
+    
+    def _wait_for_questions(self, call_id):
+        """Block until the call's background question insert has run, so answer UPDATEs find the rows"""
+        with self._cache_lock:
+            save_future = self._pending_question_saves.get(str(call_id))
+        if save_future is not None:
+            save_future.result()  # _save_questions logs and swallows its own errors
+    
     def handle_voice_flow(self, call_id, current_question=0):
         """
         Generate TwiML for voice flow
@@ -95,25 +160,12 @@ class VoiceHandler:
                 response.hangup()
                 return str(response)
             
-            logger.info(f"Voice flow called: call_id={call_id_str} (type: {type(call_id)}), current_question={current_question}, cache_keys={list(self.questions_cache.keys())}")
+            logger.info(f"Voice flow called: call_id={call_id_str} (type: {type(call_id)}), current_question={current_question}, cached_calls={len(self.questions_cache)}")
             
             # Try to get questions from cache first (faster, works without DB)
-            # Check multiple variations of call_id
-            questions = None
-            if call_id_str in self.questions_cache:
-                questions = self.questions_cache[call_id_str]
-                logger.info(f"Found questions in cache with string key: {call_id_str}")
-            elif call_id in self.questions_cache:
-                questions = self.questions_cache[call_id]
-                logger.info(f"Found questions in cache with original key: {call_id}")
-            elif call_id_str.isdigit():
-                try:
-                    call_id_int = int(call_id_str)
-                    if call_id_int in self.questions_cache:
-                        questions = self.questions_cache[call_id_int]
-                        logger.info(f"Found questions in cache with int key: {call_id_int}")
-                except ValueError:
-                    pass
+            questions = self.questions_cache.get(call_id_str)
+            if questions:
+                logger.info(f"Found questions in cache for call_id: {call_id_str}")
             
             # If not in cache, try database
             if not questions and self.db_available and self.db:
@@ -124,13 +176,15 @@ class VoiceHandler:
                     if call_data and call_data.get('questions_json'):
                         questions = json.loads(call_data['questions_json'])
                         # Cache for future use (use string key for consistency)
-                        self.questions_cache[call_id_str] = questions
+                        self._cache_questions(call_id_str, questions)
                         logger.info(f"Loaded {len(questions)} questions from database for call_id {call_id_str}")
                 except Exception as db_error:
                     logger.warning(f"Database query failed: {str(db_error)}")
             
             if not questions:
-                logger.error(f"No questions found for call_id={call_id_str} (original={call_id}). Cache has {len(self.questions_cache)} entries with keys: {list(self.questions_cache.keys())}")
+                with self._cache_lock:
+                    cached_keys = list(self.questions_cache)
+                logger.error(f"No questions found for call_id={call_id_str} (original={call_id}). Cache has {len(cached_keys)} entries with keys: {cached_keys}")
                 response = VoiceResponse()
                 response.say("I'm sorry, but I could not find the questions for this call. The call will now end.", voice='alice')
                 response.hangup()
@@ -182,7 +236,7 @@ class VoiceHandler:
                     input='speech dtmf',  # Accept both speech and keypad input
                     language='en-US',
                     speech_timeout='auto',  # Wait for natural pause in speech
-                    action=f'{self.webhook_url}/api/process-answer?call_id={call_id}&q_num={current_question}',
+                    action=f'{self.process_answer_url}?call_id={call_id}&q_num={current_question}',
                     method='POST',
                     timeout=15,  # Increased timeout to 15 seconds to wait for response
                     num_digits=1,  # Accept 1 digit for keypad input (1=yes, 2=no)
@@ -198,7 +252,7 @@ class VoiceHandler:
                 response.say('I did not receive a response. Moving to the next question.', voice='alice')
                 response.pause(length=0.5)
                 # Redirect to next question
-                response.redirect(f'{self.webhook_url}/api/voice-flow?call_id={call_id}&q_num={current_question + 1}')
+                response.redirect(f'{self.voice_flow_url}?call_id={call_id}&q_num={current_question + 1}')
                 
             else:
                 # All questions completed
@@ -217,8 +271,8 @@ class VoiceHandler:
                         logger.warning(f"Could not complete call in database: {str(db_error)}")
                 
                 # Clean up cache after call completes
-                if call_id in self.questions_cache:
-                    del self.questions_cache[call_id]
+                with self._cache_lock:
+                    self.questions_cache.pop(str(call_id), None)
             
             return str(response)
         except Exception as e:
@@ -244,16 +298,11 @@ class VoiceHandler:
             answer_confidence = 0.0
             
             if speech_result and speech_result.strip():
-                # Process speech recognition result
-                speech_lower = speech_result.lower().strip()
-                
-                # Check for yes variations
-                yes_keywords = ['yes', 'yeah', 'yep', 'correct', 'right', 'sure', 'okay', 'ok', 'yup', 'affirmative']
-                if any(word in speech_lower for word in yes_keywords):
+                # Process speech recognition result - check for yes variations, then no variations
+                if YES_RE.search(speech_result):
                     answer = 'yes'
                     answer_confidence = float(confidence) if confidence else 0.9
-                # Check for no variations
-                elif any(word in speech_lower for word in ['no', 'nope', 'nah', 'incorrect', 'wrong', 'negative']):
+                elif NO_RE.search(speech_result):
                     answer = 'no'
                     answer_confidence = float(confidence) if confidence else 0.9
                 else:
@@ -282,6 +331,7 @@ class VoiceHandler:
             # Store the answer in database (optional)
             if self.db_available and self.db:
                 try:
+                    self._wait_for_questions(call_id)
                     self.db.save_answer(
                         call_id=call_id,
                         question_num=question_num,
@@ -306,13 +356,13 @@ class VoiceHandler:
             
             # Move to next question
             next_question = question_num + 1
-            response.redirect(f'{self.webhook_url}/api/voice-flow?call_id={call_id}&q_num={next_question}')
+            response.redirect(f'{self.voice_flow_url}?call_id={call_id}&q_num={next_question}')
             
             return str(response)
         except Exception as e:
             logger.error(f"Error processing answer: {str(e)}")
             response = VoiceResponse()
             response.say("An error occurred. Moving to the next question.", voice='alice')
-            response.redirect(f'{self.webhook_url}/api/voice-flow?call_id={call_id}&q_num={question_num + 1}')
+            response.redirect(f'{self.voice_flow_url}?call_id={call_id}&q_num={question_num + 1}')
             return str(response)
 